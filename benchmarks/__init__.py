@@ -0,0 +1,2 @@
+# The benchmarks package contains scripts that measure the performance of the game engine.
+# They must be run from the root of the project as modules, for example: python -m benchmarks.arena_tick
@@ -0,0 +1,74 @@
+"""
+Module created by Giovanni Ancora for a project at UniPr.
+@author Giovanni Ancora (https://github.com/GioTFG and https://github.com/GiovanniAncora)
+This project on GitHub: https://github.com/GioTFG/Ghosts-and-Goblins
+
+Benchmark of the memory and construction time of the actors, for stress levels with thousands of them.
+For each kind of actor it builds N of them (as the game does: eyeballs are added to the Projectiles of an arena) and prints:
+- bytes: memory allocated per actor, everything it owns included (measured in a separate run, with tracemalloc);
+- us: construction time per actor, in microseconds.
+
+Usage: python -m benchmarks.actor_memory [--count N] [--kinds Zombie Eyeball ...]
+"""
+
+import argparse
+import time
+import tracemalloc
+from random import Random
+
+from src.actors.arthur import Arthur
+from src.actors.enemies import Zombie, Eyeball, Plant
+from src.actors.platforms import Grave
+from src.actors.weapons import Torch
+from src.framework.actor import Arena
+
+# name: function building the i-th actor, given the arena and a random generator
+KINDS = {
+    "Zombie": lambda i, arena, rng: Zombie((i % 3000, 150), "Left", rng),
+    "Eyeball": lambda i, arena, rng: Eyeball((i % 3000, 150), (1.5, -0.5), arena),
+    "Plant": lambda i, arena, rng: Plant((i % 3000, 150)),
+    "Torch": lambda i, arena, rng: Torch("Right", (i % 3000, 150)),
+    "Grave": lambda i, arena, rng: Grave((i % 3000, 150), (16, 16)),
+    "Arthur": lambda i, arena, rng: Arthur((i % 3000, 150)),
+}
+
+
+def build(kind: str, count: int) -> list:
+    arena, rng, make = Arena((3000, 240)), Random(0), KINDS[kind]
+    return [make(i, arena, rng) for i in range(count)]
+
+
+def run_kind(kind: str, count: int) -> dict:
+    start = time.perf_counter()
+    actors = build(kind, count)
+    elapsed = time.perf_counter() - start
+    del actors
+
+    # Memory is measured on a second run, as tracemalloc slows everything down
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    actors = build(kind, count)
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del actors
+
+    return {
+        "bytes": allocated / count,
+        "us": elapsed / count * 1e6,
+    }
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description="Memory and construction time per actor.")
+    parser.add_argument("--count", type=int, default=100_000)
+    parser.add_argument("--kinds", nargs="+", choices=KINDS, default=["Zombie", "Eyeball"])
+    args = parser.parse_args(argv)
+
+    print(f"{'kind':>8} {'count':>8} {'bytes':>8} {'us':>7}")
+    for kind in args.kinds:
+        r = run_kind(kind, args.count)
+        print(f"{kind:>8} {args.count:>8} {r['bytes']:>8.1f} {r['us']:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
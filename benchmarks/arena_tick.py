@@ -0,0 +1,205 @@
+"""
+Module created by Giovanni Ancora for a project at UniPr.
+@author Giovanni Ancora (https://github.com/GioTFG and https://github.com/GiovanniAncora)
+This project on GitHub: https://github.com/GioTFG/Ghosts-and-Goblins
+
+Benchmark of Arena.tick on synthetic arenas, for each collision engine:
+- "grid": Arena._detect_collisions (static index + grid of the moving actors, refiled when they move);
+- "naive": Arena._naive_collisions (every body against every body: like the grid, it skips the Projectiles actor,
+  which has no size).
+
+Each scenario generates an arena with some static rectangles (Ground, BackgroundPlatform, Grave) and some moving actors
+(Zombies, Eyeballs, Torches: the last two are moved in batch by a Projectiles actor), then ticks it. The actors behave as in the game (zombies walk and despawn, torches fall
+and turn into flames...), and the same seed always generates the same arena, so both engines get the same work.
+
+For each scenario and engine it measures:
+- ticks_per_s: whole ticks per second;
+- collision_ms: mean time of the collision phase of a tick, in milliseconds;
+- alloc_kib: mean peak of the memory allocated during a tick, in KiB (measured in a separate run, with tracemalloc).
+
+Usage:
+python -m benchmarks.arena_tick [--ticks N] [--engines grid naive] [--save results.json] [--compare baseline.json]
+python -m benchmarks.arena_tick --width 8000 --static 800 --zombies 40 --eyeballs 40 --torches 10
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from random import Random
+
+from src.actors.enemies import Zombie, Eyeball
+from src.actors.platforms import Ground, BackgroundPlatform, Grave
+from src.actors.projectiles import Projectiles
+from src.actors.weapons import Torch
+from src.framework.actor import Arena
+
+HEIGHT = 240
+GROUND_Y = 200
+
+ENGINES = {
+    "grid": Arena._detect_collisions,
+    "naive": Arena._naive_collisions,
+}
+
+# The naive engine is quadratic: on bigger arenas it would take minutes, so it is skipped
+NAIVE_MAX_ACTORS = 500
+
+# name: (width, static rectangles, zombies, eyeballs, torches)
+SCENARIOS = {
+    "level1": (3584, 100, 4, 6, 2),
+    "wide_sparse": (20000, 600, 4, 6, 2),
+    "wide_dense": (20000, 2000, 4, 6, 2),
+    "crowded": (3584, 100, 60, 120, 20),
+    "wide_crowded": (20000, 600, 60, 120, 20),
+}
+
+
+class BenchArena(Arena):
+    """
+    An Arena that uses the chosen collision engine and measures the time spent in the collision phase.
+    """
+    def __init__(self, size, rng: Random, engine: str):
+        super().__init__(size, rng)
+        self._engine = ENGINES[engine]
+        self.collision_time = 0.0
+
+    def _detect_collisions(self):
+        start = time.perf_counter()
+        self._engine(self)
+        self.collision_time += time.perf_counter() - start
+
+
+def make_arena(engine: str, width: int, static: int, zombies: int, eyeballs: int, torches: int, seed: int = 0) -> BenchArena:
+    rng = Random(seed)
+    arena = BenchArena((width, HEIGHT), rng, engine)
+
+    # Static actors: a ground made of tiles, then random platforms and graves
+    tiles = max(static // 3, 1)
+    tile_w = -(-width // tiles)
+    for i in range(tiles):
+        arena.spawn(Ground((i * tile_w, GROUND_Y), (tile_w, HEIGHT - GROUND_Y)))
+    for i in range(static - tiles):
+        if i % 2 == 0:
+            arena.spawn(BackgroundPlatform((rng.randrange(width - 64), rng.randrange(80, GROUND_Y - 20)), (64, 8)))
+        else:
+            arena.spawn(Grave((rng.randrange(width - 16), GROUND_Y - 16), (16, 16)))
+
+    # Moving actors
+    for _ in range(zombies):
+        arena.spawn(Zombie((rng.randrange(width - 30), GROUND_Y - 32), rng.choice(("Left", "Right")), rng))
+    for _ in range(eyeballs):
+        Eyeball((rng.randrange(width), rng.randrange(GROUND_Y)), (rng.uniform(-1, 1), rng.uniform(-1, 1)), arena)
+    for _ in range(torches):
+        torch = Torch(rng.choice(("Left", "Right")), (rng.randrange(width), rng.randrange(20, 100)))
+        Projectiles.of(arena).add(torch, hostile=False)
+    return arena
+
+
+def run_scenario(engine: str, params: tuple, ticks: int) -> dict:
+    arena = make_arena(engine, *params)
+    actors = len(arena.actors()) + len(Projectiles.of(arena).projectiles()) - 1
+    start = time.perf_counter()
+    for _ in range(ticks):
+        arena.tick()
+    elapsed = time.perf_counter() - start
+    collision_time = arena.collision_time
+
+    # Allocations are measured on a second, identical arena, as tracemalloc slows everything down
+    arena = make_arena(engine, *params)
+    tracemalloc.start()
+    peaks = 0
+    for _ in range(ticks):
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        arena.tick()
+        peaks += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+
+    return {
+        "actors": actors,
+        "ticks_per_s": ticks / elapsed,
+        "collision_ms": collision_time / ticks * 1000,
+        "alloc_kib": peaks / ticks / 1024,
+    }
+
+
+def run_all(scenarios: dict, engines: list[str], ticks: int) -> dict:
+    results = {"python": platform.python_version(), "ticks": ticks, "scenarios": {}}
+    for name, params in scenarios.items():
+        results["scenarios"][name] = {"params": params}
+        for engine in engines:
+            if engine == "naive" and sum(params[1:]) > NAIVE_MAX_ACTORS:
+                continue
+            results["scenarios"][name][engine] = run_scenario(engine, params, ticks)
+    return results
+
+
+def format_results(results: dict, engines: list[str]) -> str:
+    lines = [f"{'scenario':>14} {'engine':>6} {'actors':>7} {'ticks/s':>10} {'coll. ms':>9} {'alloc KiB':>10}"]
+    for name, scenario in results["scenarios"].items():
+        for engine in engines:
+            if engine not in scenario:
+                lines.append(f"{name:>14} {engine:>6}  skipped (more than {NAIVE_MAX_ACTORS} actors)")
+                continue
+            r = scenario[engine]
+            lines.append(f"{name:>14} {engine:>6} {r['actors']:>7} {r['ticks_per_s']:>10.1f} {r['collision_ms']:>9.3f} {r['alloc_kib']:>10.1f}")
+    return "\n".join(lines)
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Compares the ticks per second with the ones of a baseline.
+    :return: A description of every scenario/engine slower than the baseline by more than tolerance (a fraction).
+    """
+    regressions = []
+    for name, scenario in results["scenarios"].items():
+        for engine, r in scenario.items():
+            if engine == "params" or engine not in baseline["scenarios"].get(name, {}):
+                continue
+            old = baseline["scenarios"][name][engine]["ticks_per_s"]
+            if r["ticks_per_s"] < old * (1 - tolerance):
+                regressions.append(f"{name}/{engine}: {r['ticks_per_s']:.1f} ticks/s, baseline {old:.1f}")
+    return regressions
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description="Benchmark of Arena.tick with synthetic actor populations.")
+    parser.add_argument("--ticks", type=int, default=100)
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=list(ENGINES))
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--width", type=int, help="Run only a custom scenario with this arena width")
+    parser.add_argument("--static", type=int, default=100)
+    parser.add_argument("--zombies", type=int, default=10)
+    parser.add_argument("--eyeballs", type=int, default=10)
+    parser.add_argument("--torches", type=int, default=5)
+    parser.add_argument("--save", help="Save the results as JSON in this file")
+    parser.add_argument("--compare", help="Compare the results with a JSON baseline saved with --save")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed slowdown against the baseline (fraction)")
+    args = parser.parse_args(argv)
+
+    if args.width:
+        scenarios = {"custom": (args.width, args.static, args.zombies, args.eyeballs, args.torches)}
+    else:
+        scenarios = {name: SCENARIOS[name] for name in args.scenarios}
+
+    results = run_all(scenarios, args.engines, args.ticks)
+    print(format_results(results, args.engines))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for r in regressions:
+            print("REGRESSION", r)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Module created by Giovanni Ancora for a project at UniPr.
+@author Giovanni Ancora (https://github.com/GioTFG and https://github.com/GiovanniAncora)
+This project on GitHub: https://github.com/GioTFG/Ghosts-and-Goblins
+
+Benchmark of the scale modes of g2d.init_canvas ("copy", "into", "sdl"), with the same canvas size and zoom as the game.
+Each frame draws a game-like scene (background, some sprites, the HUD) and presents it with update_canvas.
+For each mode it prints the mean and 95th percentile of the whole frame and of update_canvas alone, in milliseconds.
+(The surfaces allocated by "copy" are SDL memory, invisible to tracemalloc, so their cost shows up as time.)
+
+It needs pygame and a display (or SDL_VIDEODRIVER=dummy, where "sdl" only works in the first window of the process,
+so it is always run first).
+Usage: python -m benchmarks.present [--frames N] [--zoom Z] [--modes copy into sdl] [--dirty]
+"""
+
+import argparse
+import os
+import time
+
+from src.framework import g2d
+from src.framework.gnggame import VIEW_W, VIEW_H
+
+from path_util import ROOT_PATH
+
+SPRITES = os.path.join(ROOT_PATH, "img", "ghosts-goblins.png")
+BACKGROUND = os.path.join(ROOT_PATH, "img", "ghosts-goblins-bg.png")
+CANVAS_SIZE = VIEW_W, VIEW_H + 80 # The game adds 80 pixels of HUD under the view
+
+
+def draw_frame(n: int):
+    g2d.draw_image(BACKGROUND, (-(n % 400), 0), (2 + n % 400, 10), (VIEW_W, VIEW_H))
+    for i in range(30):
+        g2d.draw_image(SPRITES, ((i * 37 + n * 3) % VIEW_W, (i * 53) % (VIEW_H - 32)), (585, 66), (22, 31))
+    g2d.set_color((255, 50, 50))
+    g2d.draw_rect((0, VIEW_H), (VIEW_W, 80))
+
+
+def percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * p), len(values) - 1)]
+
+
+def run_mode(mode: str, frames: int, zoom: int, dirty: bool) -> dict:
+    g2d.init_canvas(CANVAS_SIZE, zoom, dirty, mode)
+    frame_times, update_times = [], []
+    for n in range(frames):
+        start = time.perf_counter()
+        draw_frame(n)
+        mid = time.perf_counter()
+        g2d.update_canvas()
+        end = time.perf_counter()
+        frame_times.append(end - start)
+        update_times.append(end - mid)
+
+    return {
+        "frame_ms": sum(frame_times) / frames * 1000,
+        "frame_p95_ms": percentile(frame_times, 0.95) * 1000,
+        "update_ms": sum(update_times) / frames * 1000,
+        "update_p95_ms": percentile(update_times, 0.95) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Frame time of the g2d scale modes.")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--zoom", type=int, default=3)
+    parser.add_argument("--modes", nargs="+", choices=("copy", "into", "sdl"), default=["copy", "into", "sdl"])
+    parser.add_argument("--dirty", action="store_true", help="Also enable dirty rectangles")
+    args = parser.parse_args()
+
+    print(f"{'mode':>5} {'frame ms':>9} {'p95':>7} {'update ms':>10} {'p95':>7}")
+    for mode in sorted(args.modes, key=lambda m: m != "sdl"): # SCALED may fail once another window was opened
+        try:
+            r = run_mode(mode, args.frames, args.zoom, args.dirty)
+        except Exception as e: # e.g. SCALED is not supported by the video driver
+            print(f"{mode:>5}  not available: {e}")
+            continue
+        print(f"{mode:>5} {r['frame_ms']:>9.3f} {r['frame_p95_ms']:>7.3f} {r['update_ms']:>10.3f} "
+              f"{r['update_p95_ms']:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
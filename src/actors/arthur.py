@@ -7,12 +7,83 @@ This project on GitHub: https://github.com/GioTFG/Ghosts-and-Goblins
 from src.actors.enemies import Enemy, MagicProjectile
 from src.actors.platforms import BackgroundSolid, BackgroundPlatform, BackgroundActor, BackgroundLadder, \
     BackgroundWinArea, Grave
+from src.actors.projectiles import Projectiles, PROJECTILES_ROLE
 from src.actors.weapons import Torch
 from src.framework.actor import Actor, Arena, Point
 from src.framework.utilities import center, remove_pos
 
 FPS = 30
 
+# Directions Arthur can face
+RIGHT, LEFT = 0, 1
+DIRECTIONS = ("Right", "Left")
+
+# Kinds of actors Arthur reacts to when colliding with them (see Arthur.move)
+COLLIDING_KINDS = (BackgroundSolid, BackgroundPlatform, Enemy, BackgroundWinArea)
+
+# Arthur's poses. A state is a pose in a direction, and its ID is pose * 2 + direction (see STATES)
+POSES = ("Idle", "Running1", "Running2", "Running3", "Running4", "JumpUp", "JumpDown", "Climbing", "Hurt",
+         "Dead1", "Dead2", "Dead3", "Dead4", "Dead5", "Won",
+         "FrogWalk1", "FrogWalk2", "FrogWalk3", "FrogWalk4", "Ghost1", "Ghost2")
+STATES = tuple(pose + direction for pose in POSES for direction in DIRECTIONS) # State ID -> name (e.g. "IdleRight")
+STATE_IDS = {name: i for i, name in enumerate(STATES)}
+
+# Flags of Arthur's state machine (see Arthur._flags)
+WON, DEAD, FROG, GHOST, HURT, LADDER = (1 << i for i in range(6))
+
+
+def _animation(*poses: str, period: float = 1, facing: bool = True) -> tuple[tuple[tuple[int, ...], ...], float]:
+    """
+    Compiles an animation of Arthur, used by the rules of his state machine (see Arthur._state_rules).
+    :param poses: The poses cycled through, one every period ticks of the arena.
+    :param facing: If True, the poses are in the direction Arthur is facing. Otherwise, they are full state names
+    (e.g. "ClimbingRight"), the same whatever the direction.
+    :return: For each direction, the IDs of the states of the animation; and the period.
+    """
+    if facing:
+        return tuple(tuple(STATE_IDS[pose + d] for pose in poses) for d in DIRECTIONS), period
+    return (tuple(STATE_IDS[state] for state in poses),) * len(DIRECTIONS), period
+
+
+def _compile_rules(rules: tuple) -> tuple[tuple, ...]:
+    """
+    Compiles the rules of Arthur's state machine: for every combination of flags, the (condition, animation) of the
+    rules whose flag is set, in order, up to the first one without a condition (the following ones can't apply).
+    """
+    compiled = []
+    for flags in range((WON | DEAD | FROG | GHOST | HURT | LADDER) + 1):
+        applying = []
+        for flag, condition, animation in rules:
+            if flag & flags == flag:
+                applying.append((condition, animation))
+                if condition is None:
+                    break
+        compiled.append(tuple(applying))
+    return tuple(compiled)
+
+
+def _compile_tables(sprites: dict, sizes: dict, no_armour_states: frozenset) -> tuple[tuple, tuple]:
+    """
+    Compiles the sprite and size of every state, without and with the armour, in tables indexed by
+    [armour][state ID]. States missing in the dictionaries get the ones of "IdleRight".
+    """
+    sprite_table, size_table = [], []
+    for armour in (False, True):
+        state_sprites, state_sizes = [], []
+        for state in STATES:
+            x, y = sprites.get(state, sprites["IdleRight"])
+            w, h = sizes.get(state, sizes["IdleRight"])
+            if not armour:
+                h -= 2 # Height difference without the armour.
+                if state in no_armour_states:
+                    y += 66 # Offset for sprites without armour.
+            state_sprites.append((x, y))
+            state_sizes.append((w, h))
+        sprite_table.append(tuple(state_sprites))
+        size_table.append(tuple(state_sizes))
+    return tuple(sprite_table), tuple(size_table)
+
+
 class Arthur(Actor):
     """
     Arthur is the protagonist of the game.
@@ -20,18 +91,212 @@ class Arthur(Actor):
     He is controlled by the player, can attack and be attacked by other enemies.
     """
 
+    # Movement constants
+    _speed = 5
+    ## max_dy is needed so that Arthur can't fall at an ever-increasing speed.
+    ## Reaching high speeds of fall means that he could technically be placed under platforms where he should have landed on.
+    _gravity = 2
+    _human_max_dy = 8
+    _frog_max_dy = 3
+    _jump_power = -10
+    _climb_speed = 4
+
+    # Initial values of the action countdowns (in frames)
+    _torch_countdown_start = 10
+    _invincibility_frames = 90
+    _start_dying_countdown = 150
+    _max_frog_countdown = 5 * FPS # How many frames the frog state lasts
+    _max_ghost_press_count = 5
+
+    ## A dictionary of all the coordinates of the sprite in the spritesheet based on the state it has been assigned to.
+    ### As these value are different based on the direction Arthur is facing, for each state there are two values: one for each direction.
+    _sprites: dict[str, tuple[int, int]] = {
+        "IdleRight": (134, 609),
+        "IdleLeft": (358, 609),
+
+        "Running1Right": (5, 608),
+        "Running2Right": (39, 608),
+        "Running3Right": (72, 608),
+        "Running4Right": (102, 608),
+        "Running1Left": (484, 608),
+        "Running2Left": (454, 608),
+        "Running3Left": (421, 608),
+        "Running4Left": (386, 608),
+
+        "JumpUpRight": (160, 613),
+        "JumpDownRight": (194, 613),
+        "JumpUpLeft": (320, 613),
+        "JumpDownLeft": (291, 613),
+
+        "ClimbingRight": (133, 642),
+        "ClimbingLeft": (358, 642),
+
+        "HurtRight": (0, 740),
+        "HurtLeft": (487, 740),
+
+        "Dead1Right": (64, 740),
+        "Dead2Right": (96, 740),
+        "Dead3Right": (128, 743),
+        "Dead4Right": (160, 740),
+        "Dead5Right": (160, 756),
+        "Dead1Left": (423, 740),
+        "Dead2Left": (385, 740),
+        "Dead3Left": (354, 743),
+        "Dead4Left": (324, 740),
+        "Dead5Left": (324, 756),
+
+        "WonLeft": (228, 706),
+        "WonRight": (262, 706),
+
+        "FrogWalk1Right": (99, 903),
+        "FrogWalk2Right": (128, 903),
+        "FrogWalk3Right": (166, 903),
+        "FrogWalk4Right": (198, 903),
+        "FrogWalk1Left": (388, 903),
+        "FrogWalk2Left": (355, 903),
+        "FrogWalk3Left": (325, 903),
+        "FrogWalk4Left": (294, 903),
+
+        "Ghost1Right": (576, 842),
+        "Ghost2Right": (640, 842),
+        "Ghost1Left": (576, 896),
+        "Ghost2Left": (640, 896),
+    }
+    # Here even just one value for each state could be used, since no matter the direction, the size of the sprite is the same.
+    # An improved implementation that observes this can be seen in the Zombie class.
+    _sizes: dict[str, tuple[int, int]] = {
+        "IdleRight": (20, 31),
+        "IdleLeft": (20, 31),
+        "Running1Right": (23, 32),
+        "Running2Right": (18, 32),
+        "Running3Right": (19, 32),
+        "Running4Right": (24, 32),
+        "Running1Left": (23, 32),
+        "Running2Left": (18, 32),
+        "Running3Left": (19, 32),
+        "Running4Left": (24, 32),
+
+        "JumpUpRight": (32, 27),
+        "JumpDownRight": (27, 27),
+        "JumpUpLeft": (32, 27),
+        "JumpDownLeft": (27, 27),
+
+        "ClimbingLeft": (21, 30),
+        "ClimbingRight": (21, 30),
+
+        "HurtLeft": (25, 28),
+        "HurtRight": (25, 28),
+
+        "Dead1Right": (25, 28),
+        "Dead2Right": (31, 28),
+        "Dead3Right": (29, 25),
+        "Dead4Right": (28, 12),
+        "Dead5Right": (28, 12),
+        "Dead1Left": (25, 28),
+        "Dead2Left": (31, 28),
+        "Dead3Left": (29, 25),
+        "Dead4Left": (28, 12),
+        "Dead5Left": (28, 12),
+
+        "WonLeft": (22, 32),
+        "WonRight": (22, 32),
+
+        "FrogWalk1Right": (25, 25),
+        "FrogWalk2Right": (29, 25),
+        "FrogWalk3Right": (20, 25),
+        "FrogWalk4Right": (20, 25),
+        "FrogWalk1Left": (25, 25),
+        "FrogWalk2Left": (29, 25),
+        "FrogWalk3Left": (20, 25),
+        "FrogWalk4Left": (20, 25),
+
+        "Ghost1Right": (34, 38),
+        "Ghost1Left": (34, 38),
+        "Ghost2Right": (34, 38),
+        "Ghost2Left": (34, 38),
+    }
+
+    # This is basically a dictionary that maps each action that Arthur can do to a set of keys.
+    # This allows to expand the project and add customization: for example, using a menu, the player could set
+    # his own keys to each action, just like you can do in modern games.
+    # A key concept kept in mind while making this project has been exactly this: modularity, scalability and customization.
+    # It is the default map of the arena (see Arena.set_actions and GngGame), that Arthur asks for the actions down in a tick.
+    ACTIONS: dict[str, frozenset[str]] = {
+        "RunLeft": frozenset({"a", "ArrowLeft"}),
+        "RunRight": frozenset({"d", "ArrowRight"}),
+        "Jump": frozenset({"Spacebar", "left alt"}),
+        "ClimbLadder": frozenset({"w", "ArrowUp"}),
+        "DescendLadder": frozenset({"s", "ArrowDown"}),
+        "ClimbAnimation": frozenset({"ArrowUp", "ArrowDown"}), # Only the arrows animate the climb, not w and s
+        "Attack": frozenset({"f", "left ctrl"}),
+        "DebugFrog": frozenset({"l"}),
+        "Ghost": frozenset({"b"}), # b stands for BOO!
+    }
+
+    # This is a set of states whose values can be added to a certain number (66) to obtain the same sprite but without the armour.
+    _no_armour_states = frozenset([
+        "IdleLeft", "IdleRight",
+        "Running1Left", "Running2Left", "Running3Left", "Running4Left",
+        "Running1Right", "Running2Right", "Running3Right", "Running4Right",
+        "JumpUpLeft", "JumpDownLeft",
+        "JumpUpRight", "JumpDownRight",
+        "ClimbingLeft", "ClimbingRight",
+    ])
+
+    # The dictionaries above, compiled (see _compile_tables): sprite and size of each state ID, without and with the armour
+    _sprite_table, _size_table = _compile_tables(_sprites, _sizes, _no_armour_states)
+
+    # The state machine: Arthur's state is given by the first of these rules that applies, checked by set_state
+    # after he moved. A rule applies if its flag (see _flags) is set and its condition (if any) is true.
+    # Each rule gives an animation (see _animation), and the rules that can apply are precomputed for every combination
+    # of flags (see _rules_by_flags), so a state (or a new rule) costs the same as any other.
+    _state_rules = (
+        (WON, None, _animation("Won")),
+
+        # Upon death, Arthur goes through six stages, depending on his dying countdown.
+        # In the first one he cycles between "Hurt" and "Dead1", six times.
+        (DEAD, lambda a, arena: a._dying_countdown > a._start_dying_countdown * 5 / 6,
+         _animation("Hurt", "Dead1", period=150 / 6 / 6)),
+        (DEAD, lambda a, arena: a._dying_countdown > a._start_dying_countdown * 4 / 6, _animation("Dead2")),
+        (DEAD, lambda a, arena: a._dying_countdown > a._start_dying_countdown * 3 / 6, _animation("Dead3")),
+        (DEAD, lambda a, arena: a._dying_countdown > a._start_dying_countdown * 2 / 6, _animation("Dead4")),
+        (DEAD, None, _animation("Dead5")),
+
+        # Frog easter egg
+        (FROG, lambda a, arena: not arena.action_down("RunLeft") and not arena.action_down("RunRight"), _animation("FrogWalk4")),
+        (FROG, None, _animation("FrogWalk1", "FrogWalk2", "FrogWalk3", "FrogWalk4", period=5)),
+
+        # Ghost easter egg
+        (GHOST, None, _animation("Ghost1", "Ghost2", period=7)),
+
+        # If Arthur is not dead, he's been hurt if he has some invincibility frames.
+        (HURT, None, _animation("Hurt")),
+
+        # Arthur cycles between the two directions so it seems that he is climbing the ladder.
+        (LADDER, lambda a, arena: arena.action_down("ClimbAnimation"),
+         _animation("ClimbingRight", "ClimbingLeft", period=4, facing=False)),
+        (LADDER, None, _animation("ClimbingRight", facing=False)),
+
+        (0, lambda a, arena: a._dy > 0 and not a.is_on_ground(arena), _animation("JumpDown")),
+        (0, lambda a, arena: a._dy < 0 and not a.is_on_ground(arena), _animation("JumpUp")),
+
+        # Running (if both directions are pressed, Arthur doesn't move, see set_state)
+        (0, lambda a, arena: arena.action_down("RunLeft") != arena.action_down("RunRight"),
+         _animation("Running1", "Running2", "Running3", "Running4", period=3)),
+        (0, None, _animation("Idle")),
+    )
+    _rules_by_flags = _compile_rules(_state_rules)
+
+    # Only the state of each Arthur is stored in the instances: the tables and the constants above are shared by the class
+    __slots__ = ("_x", "_y", "_dx", "_dy", "_max_dy", "_grabbing_ladder", "_armour", "_dead", "_won",
+                 "_torch_countdown", "_iframes_count", "_dying_countdown", "_state", "_facing",
+                 "_frog", "_frog_count", "_ghost", "_ghost_press_count")
+
     def __init__(self, pos: Point):
         # Position and movement
         self._x, self._y = pos
         self._dx, self._dy = 0, 0
-        self._speed = 5
-        ## max._dy is needed so that Arthur can't fall at an ever-increasing speed.
-        ## Reaching high speeds of fall means that he could technically be placed under platforms where he should have landed on.
-        self._gravity, self._max_dy = 2, 8
-        self._human_max_dy = 8
-        self._frog_max_dy = 3
-        self._jump_power = -10
-        self._climb_speed = 4
+        self._max_dy = self._human_max_dy
 
         # Gameplay status
         self._grabbing_ladder = False
@@ -40,161 +305,30 @@ class Arthur(Actor):
         self._won = False
 
         # Action countdowns (in frames)
-        ## Each one of these is actually a pair of attributes: the first one being the initial value, and the second one the actual one.
-        self._torch_countdown_start, self._torch_countdown = 10, 0
-        self._invincibility_frames, self._iframes_count = 90, 0
-        self._start_dying_countdown = self._dying_countdown = 150
+        ## Each one of these has a class constant with its initial value (see above), and the actual one here.
+        self._torch_countdown = 0
+        self._iframes_count = 0
+        self._dying_countdown = self._start_dying_countdown
 
         # Animation info
         ## The state is calculated every tick and determines which sprite and size must be used in that said tick.
-        self._state = "IdleRight"
-        self._direction = "Right"
+        ## It is the ID of a state (see STATES), and _facing is a direction (RIGHT or LEFT).
+        self._state = STATE_IDS["IdleRight"]
+        self._facing = RIGHT
 
         # Frog easter egg
         self._frog = False
-        self._max_frog_countdown = self._frog_count = 5 * FPS # How many frames the frog state lasts
+        self._frog_count = self._max_frog_countdown
 
         # Ghost easter egg
         self._ghost = False
-        self._max_ghost_press_count = self._ghost_press_count = 5
-
-        ## A (static) dictionary of all the coordinates of the sprite in the spritesheet based on the state it has been assigned to.
-        ### As these value are different based on the direction Arthur is facing, for each state there are two values: one for each direction.
-        self._sprites = {
-            "IdleRight": (134, 609),
-            "IdleLeft": (358, 609),
-
-            "Running1Right": (5, 608),
-            "Running2Right": (39, 608),
-            "Running3Right": (72, 608),
-            "Running4Right": (102, 608),
-            "Running1Left": (484, 608),
-            "Running2Left": (454, 608),
-            "Running3Left": (421, 608),
-            "Running4Left": (386, 608),
-
-            "JumpUpRight": (160, 613),
-            "JumpDownRight": (194, 613),
-            "JumpUpLeft": (320, 613),
-            "JumpDownLeft": (291, 613),
-
-            "ClimbingRight": (133, 642),
-            "ClimbingLeft": (358, 642),
-
-            "HurtRight": (0, 740),
-            "HurtLeft": (487, 740),
-
-            "Dead1Right": (64, 740),
-            "Dead2Right": (96, 740),
-            "Dead3Right": (128, 743),
-            "Dead4Right": (160, 740),
-            "Dead5Right": (160, 756),
-            "Dead1Left": (423, 740),
-            "Dead2Left": (385, 740),
-            "Dead3Left": (354, 743),
-            "Dead4Left": (324, 740),
-            "Dead5Left": (324, 756),
-
-            "WonLeft": (228, 706),
-            "WonRight": (262, 706),
-
-            "FrogWalk1Right": (99, 903),
-            "FrogWalk2Right": (128, 903),
-            "FrogWalk3Right": (166, 903),
-            "FrogWalk4Right": (198, 903),
-            "FrogWalk1Left": (388, 903),
-            "FrogWalk2Left": (355, 903),
-            "FrogWalk3Left": (325, 903),
-            "FrogWalk4Left": (294, 903),
-
-            "Ghost1Right": (576, 842),
-            "Ghost2Right": (640, 842),
-            "Ghost1Left": (576, 896),
-            "Ghost2Left": (640, 896),
-        }
-        # Here even just one value for each state could be used, since no matter the direction, the size of the sprite is the same.
-        # An improved implementation that observes this can be seen in the Zombie class.
-        self._sizes = {
-            "IdleRight": (20, 31),
-            "IdleLeft": (20, 31),
-            "Running1Right": (23, 32),
-            "Running2Right": (18, 32),
-            "Running3Right": (19, 32),
-            "Running4Right": (24, 32),
-            "Running1Left": (23, 32),
-            "Running2Left": (18, 32),
-            "Running3Left": (19, 32),
-            "Running4Left": (24, 32),
-
-            "JumpUpRight": (32, 27),
-            "JumpDownRight": (27, 27),
-            "JumpUpLeft": (32, 27),
-            "JumpDownLeft": (27, 27),
-
-            "ClimbingLeft": (21, 30),
-            "ClimbingRight": (21, 30),
-
-            "HurtLeft": (25, 28),
-            "HurtRight": (25, 28),
-
-            "Dead1Right": (25, 28),
-            "Dead2Right": (31, 28),
-            "Dead3Right": (29, 25),
-            "Dead4Right": (28, 12),
-            "Dead5Right": (28, 12),
-            "Dead1Left": (25, 28),
-            "Dead2Left": (31, 28),
-            "Dead3Left": (29, 25),
-            "Dead4Left": (28, 12),
-            "Dead5Left": (28, 12),
-
-            "WonLeft": (22, 32),
-            "WonRight": (22, 32),
-
-            "FrogWalk1Right": (25, 25),
-            "FrogWalk2Right": (29, 25),
-            "FrogWalk3Right": (20, 25),
-            "FrogWalk4Right": (20, 25),
-            "FrogWalk1Left": (25, 25),
-            "FrogWalk2Left": (29, 25),
-            "FrogWalk3Left": (20, 25),
-            "FrogWalk4Left": (20, 25),
-
-            "Ghost1Right": (34, 38),
-            "Ghost1Left": (34, 38),
-            "Ghost2Right": (34, 38),
-            "Ghost2Left": (34, 38),
-        }
-
-        # This is basically a dictionary that maps each action that Arthur can do to a set of keys.
-        # This allows to expand the project and add customization: for example, using a menu, the player could set
-        # his own keys to each action, just like you can do in modern games.
-        # A key concept kept in mind while making this project has been exactly this: modularity, scalability and customization.
-        self._actions = {
-            "RunLeft": {"a", "ArrowLeft"},
-            "RunRight": {"d", "ArrowRight"},
-            "Jump": {"Spacebar", "left alt"},
-            "ClimbLadder": {"w", "ArrowUp"},
-            "DescendLadder": {"s", "ArrowDown"},
-            "Attack": {"f", "left ctrl"}
-        }
-
-        # This is a list of states whose values can be added to a certain number (66) to obtain the same sprite but without the armour.
-        self._no_armour_states = [
-            "IdleLeft", "IdleRight",
-            "Running1Left", "Running2Left", "Running3Left", "Running4Left",
-            "Running1Right", "Running2Right", "Running3Right", "Running4Right",
-            "JumpUpLeft", "JumpDownLeft",
-            "JumpUpRight", "JumpDownRight",
-            "ClimbingLeft", "ClimbingRight",
-        ]
+        self._ghost_press_count = self._max_ghost_press_count
 
     # -- INHERITED METHODS --
     def move(self, arena: Arena):
 
         # Each frame the horizontal speed is set to zero, as it is re-calculated each tick.
         self._dx = 0
-        keys = arena.current_keys()
 
         # Death management
         if self._dead and self._dying_countdown == 0:
@@ -206,7 +340,7 @@ class Arthur(Actor):
 
         ## Attacking
         if self._torch_countdown == 0:
-            if set(keys) & self._actions["Attack"] and self._iframes_count == 0 and not self._dead and not self._frog:
+            if arena.action_down("Attack") and self._iframes_count == 0 and not self._dead and not self._frog:
                 self.use_torch(arena)
                 self._torch_countdown = self._torch_countdown_start
         else:
@@ -214,12 +348,13 @@ class Arthur(Actor):
 
         # Moving right and left
         if not self._dead and not self._won:
-            if set(keys) & self._actions["RunLeft"] and not (set(keys) & self._actions["RunRight"]):
+            left, right = arena.action_down("RunLeft"), arena.action_down("RunRight")
+            if left and not right:
                 self._dx = -self._speed
-                self._direction = "Left"
-            if set(keys) & self._actions["RunRight"] and not set(keys) & self._actions["RunLeft"]:
+                self._facing = LEFT
+            if right and not left:
                 self._dx = self._speed
-                self._direction = "Right"
+                self._facing = RIGHT
             # Se si cliccano sia sx che dx, non succede niente
 
         w, h = self.size()
@@ -232,13 +367,17 @@ class Arthur(Actor):
                 else:
                     self._grabbing_ladder = False
             else:
-                if self._actions["ClimbLadder"] & set(keys):
+                if arena.action_down("ClimbLadder"):
                     self._dy = -5
-                if self._actions["DescendLadder"] & set(keys):
+                if arena.action_down("DescendLadder"):
                     self._dy = 5
 
         # Collisions
-        for other in arena.collisions():
+        # Enemy projectiles aren't in the arena collisions: they are looked up before Arthur is moved by any solid,
+        # and handled last, as they are spawned after the level
+        projectiles = arena.role(PROJECTILES_ROLE)
+        hits = projectiles.hits(self) if projectiles is not None else []
+        for other in arena.collisions(COLLIDING_KINDS): # In spawn order
             if isinstance(other, BackgroundSolid):
                 self._solid_collision(arena, other)
             elif isinstance(other, BackgroundPlatform):
@@ -247,6 +386,8 @@ class Arthur(Actor):
                 self.hurt(arena, other)
             elif isinstance(other, BackgroundWinArea):
                 self._won = True
+        for other in hits:
+            self.hurt(arena, other)
 
         self._x += self._dx
         self._y += self._dy
@@ -270,7 +411,7 @@ class Arthur(Actor):
             self._iframes_count -= 1
 
         # Debug frog
-        if "l" in keys:
+        if arena.action_down("DebugFrog"):
             self._frog = True
             self._frog_count = 15000
 
@@ -285,8 +426,7 @@ class Arthur(Actor):
             self._max_dy = self._human_max_dy
 
         # Ghost easter egg
-        if "b" in keys and self._ghost_press_count <= 0:
-            # b stands for BOO!
+        if arena.action_down("Ghost") and self._ghost_press_count <= 0:
             self._ghost = not self._ghost
             self._ghost_press_count = self._max_ghost_press_count
 
@@ -301,16 +441,7 @@ class Arthur(Actor):
         return self._x, self._y
 
     def size(self) -> Point:
-        if self._state in self._sizes:
-            size_value = self._sizes[self._state]
-
-        # To avoid possible bugs, if the program somehow calculates a state not present in the dictionary, "IdleRight" is used as a default.
-        else: size_value = self._sizes["IdleRight"]
-
-        if not self._armour:
-            size_value = size_value[0], size_value[1] - 2 # Height difference without the armour.
-
-        return size_value
+        return self._size_table[self._armour][self._state]
 
     def sprite(self) -> Point | None:
 
@@ -318,15 +449,7 @@ class Arthur(Actor):
         if not self._dead and self._iframes_count > 0 and self._iframes_count % 2 == 0:
             return None
 
-        if self._state in self._sprites:
-            sprite_pos = self._sprites[self._state]
-        else:
-            sprite_pos = self._sprites["IdleRight"] # IdleRight is the default state, if a size for the current one can't be found.
-
-        if not self._armour and self._state in self._no_armour_states:
-            sprite_pos = sprite_pos[0], sprite_pos[1] + 66 #Offset for sprites without armour.
-
-        return sprite_pos
+        return self._sprite_table[self._armour][self._state]
 
     # -- STATE METHODS --
     def is_on_ground(self, arena: Arena) -> bool:
@@ -334,8 +457,8 @@ class Arthur(Actor):
         Returns true if Arthur has landed on the ground and not moving vertically.
         This is used to check if he can jump and to calculate the state.
         """
-        for other in arena.collisions():
-            if isinstance(other, BackgroundActor) and other.is_jumpable():
+        for other in arena.collisions(BackgroundActor):
+            if other.is_jumpable():
                 other_x, other_y = other.pos()
                 # other_w, other_h = other.size()
                 if self._y < other_y and self._dy >= 0:
@@ -346,100 +469,38 @@ class Arthur(Actor):
         """
         Returns true if Arthur is colliding with a ladder object (he mustn't necessarily be climbing it for this to be true).
         """
-        for other in arena.collisions():
-            if isinstance(other, BackgroundLadder):
-                return other
-        return None
+        ladders = arena.collisions(BackgroundLadder)
+        return ladders[0] if ladders else None
 
     def set_state(self, arena: Arena):
         """
-        This method calculates Arthur's state based on his paramethers.
+        This method calculates Arthur's state based on his paramethers, through the rules of _state_rules.
         The calculated state is very important, as it represents the sprite that must be used for the current frame.
         """
-        keys = arena.current_keys()
-
-        # Default state
-        self._state = "Idle" + self._direction
-
-        # Running states
-        """
-        This is a fast way to check if any of the elements present on the first list are present in the second list.
-        It basically checks the intersection of the two corresponding sets:
-        - if there aren't pressed keys present to make Arthur move left (or right), we get an empty set, which is Falsey.
-        - Otherwise, we would get a set containing the pressed keys correct for this action, and since it's not an empty set, it's Truthy.
-        """
-        if set(keys) & self._actions["RunLeft"] or set(keys) & self._actions["RunRight"]:
-            ### Every three frames the sprite cycles to the next.
-            self._state = "Running" + str(((arena.count() // 3) % 4) + 1) + self._direction
-
         # If both of the keys to go left and right are pressed at the same time, right is chosen as a default direction.
         # (even if Arthur won't actually move)
-        if set(keys) & self._actions["RunLeft"] and set(keys) & self._actions["RunRight"]:
-            self._state = "IdleRight"
-            self._direction = "Right"
-
-        if self._won:
-            self._state = "Won" + self._direction
-        elif self._dead:
-            # Upon death, Arthur goes through many states, depending on the values of his death_countdown:
-            # - Since there are six total death states, each state will be the total countdown divided by six
-            state_time = self._start_dying_countdown / 6
-
-            # We check which is the stage we are in currently, and produce the corresponding state.
-            if self._dying_countdown > state_time * 5:
-                ## In this stage, Arthur actually cycles between two inner states: "Hurt" and "Dead1"
-                iterations = 6 # Number of sprite cycles between "Hurt" and "Dead1".
-                iteration_frames = self._start_dying_countdown / 6 / iterations # Number of frames the sprite has to cycle between the two states.
-                c = (arena.count() // iteration_frames) % 2 # Variable that decides the actual state.
-                if c == 0:
-                    self._state = "Hurt" + self._direction
-                else:
-                    self._state = "Dead1" + self._direction
-
-            elif self._dying_countdown > state_time * 4:
-                self._state = "Dead2" + self._direction
-            elif self._dying_countdown > state_time * 3:
-                self._state = "Dead3" + self._direction
-            elif self._dying_countdown > state_time * 2:
-                self._state = "Dead4" + self._direction
-            else:
-                self._state = "Dead5" + self._direction
-
-        # Frog easter egg
-        elif self._frog and self._frog_count > 0:
-            if not set(keys) & (self._actions["RunLeft"] | self._actions["RunRight"]):
-                self._state = "FrogWalk4" + self._direction
-            else:
-                count = ((arena.count() // 5) % 4) + 1
-                self._state = "FrogWalk" + str(count) + self._direction
-
-        # Ghost easter egg
-        elif self._ghost:
-            count = ((arena.count() // 7) % 2) + 1
-            self._state = "Ghost" + str(count) + self._direction
+        if arena.action_down("RunLeft") and arena.action_down("RunRight"):
+            self._facing = RIGHT
 
+        for condition, (states, period) in self._rules_by_flags[self._flags()]:
+            if condition is None or condition(self, arena):
+                states = states[self._facing]
+                self._state = states[int(arena.count() // period) % len(states)] if len(states) > 1 else states[0]
+                return
 
-        # If arthur is not dead, we check if he's been hurt (we know if he has, as he has some invincibility frames).
-        elif not self._armour and self._iframes_count > 0:
-            self._state = "Hurt" + self._direction
+    def _flags(self) -> int:
+        """
+        Returns the flags of the state machine that are set (see _state_rules).
+        """
+        return (self._won * WON | self._dead * DEAD | (self._frog and self._frog_count > 0) * FROG
+                | self._ghost * GHOST | (not self._armour and self._iframes_count > 0) * HURT
+                | self._grabbing_ladder * LADDER)
 
-        # Here we cycle between the two directions so it seems that Arthur is climbing the ladder.
-        elif self._grabbing_ladder:
-            if {"ArrowUp", "ArrowDown"} & set(keys):
-                count = (arena.count() // 4) % 2
-                self._state = "ClimbingRight" if count == 0 else "ClimbingLeft"
-            else:
-                self._state = "ClimbingRight"
-        elif not self.is_on_ground(arena):
-            if self._dy > 0:
-                self._state = "JumpDown" + self._direction
-            elif self._dy < 0:
-                self._state = "JumpUp" + self._direction
-        elif not self.is_on_ground(arena):
-            if self._dy > 0:
-                self._state = "JumpDown" + self._direction
-            elif self._dy < 0:
-                self._state = "JumpUp" + self._direction
+    def get_state(self) -> str:
+        """
+        Returns the name of the current state (e.g. "Running2Left").
+        """
+        return STATES[self._state]
 
     def has_won(self) -> bool:
         return self._won
@@ -452,8 +513,7 @@ class Arthur(Actor):
         """
         Here the program checks if the correct key for jumping is used, if Arthur can actually jump, and in that case, jump.
         """
-        keys = arena.current_keys()
-        if set(keys) & self._actions["Jump"] and self.is_on_ground(arena) and not self._grabbing_ladder and not self._ghost:
+        if arena.action_down("Jump") and self.is_on_ground(arena) and not self._grabbing_ladder and not self._ghost:
             self._dy = self._jump_power
 
     def use_torch(self, arena: Arena):
@@ -463,7 +523,7 @@ class Arthur(Actor):
         """
         if not self._grabbing_ladder and not self._won:
             torch_pos = center(self.pos(), self.size()) # The weapon is spawned at the center of Arthur's sprite.
-            arena.spawn(Torch(self._direction, torch_pos))
+            Projectiles.of(arena).add(Torch(DIRECTIONS[self._facing], torch_pos), hostile=False)
 
 
     # -- COLLISION METHODS --
@@ -548,7 +608,7 @@ class Arthur(Actor):
             # In this case Arthur has been hit when vulnerable
 
             # When hurt, Arthur gets knocked back
-            self._dx = -30 if self._direction == "Right" else 30
+            self._dx = -30 if self._facing == RIGHT else 30
             self._dy = -10
 
             # If he's a frog, he turns back into a human
@@ -595,12 +655,11 @@ class Arthur(Actor):
         if self._frog or self._ghost:
             return
 
-        keys = arena.current_keys()
-        if self._actions["Jump"].union(self._actions["RunRight"].union(self._actions["RunLeft"])) & set(keys):
+        if arena.action_down("Jump") or arena.action_down("RunRight") or arena.action_down("RunLeft"):
             # If the player jumps while climbing the ladder, he stops climbing it to jump
             self._grabbing_ladder = False
 
-        if set(keys) & self._actions["ClimbLadder"] or set(keys) & self._actions["DescendLadder"]:
+        if arena.action_down("ClimbLadder") or arena.action_down("DescendLadder"):
             self._grabbing_ladder = True
 
         if self._grabbing_ladder:
@@ -613,22 +672,39 @@ class Arthur(Actor):
             # If Arthur's climbing the ladder
             self._dy = 0 # he shouldn't be affected by gravity
 
-            if set(keys) & self._actions["DescendLadder"]:
+            if arena.action_down("DescendLadder"):
                 self._grabbing_ladder = True
                 self._dy += self._climb_speed
-            if set(keys) & self._actions["ClimbLadder"]:
+            if arena.action_down("ClimbLadder"):
                 self._grabbing_ladder = True
                 self._dy -= self._climb_speed
 
 # TESTING
 import unittest
 import unittest.mock
+
+def _collisions(*actors):
+    """
+    Side effect for a mocked arena.collisions, that filters the actors by kind as Arena.collisions does.
+    """
+    return lambda kind=None: [a for a in actors if kind is None or isinstance(a, kind)]
+
+def _press(arena, *keys):
+    """
+    Makes a mocked arena answer action_down as an Arena with Arthur's actions and these keys pressed.
+    """
+    real = Arena((1, 1))
+    real.set_actions(Arthur.ACTIONS)
+    real.tick(list(keys))
+    arena.action_down.side_effect = real.action_down
+
 class ArthurTest(unittest.TestCase):
     def test_gravity(self):
         arthur = Arthur((100, 100))
         arena = unittest.mock.Mock()
+        arena.role.return_value = None # No projectiles
         arena.collisions.return_value = []
-        arena.current_keys.return_value = []
+        _press(arena)
         arena.size.return_value = (500, 500)
 
         arthur.move(arena)
@@ -645,8 +721,9 @@ class ArthurTest(unittest.TestCase):
         grave.pos.return_value = (242, 186)
         grave.size.return_value = (16, 16)
         arena = unittest.mock.Mock()
-        arena.collisions.return_value = [grave]
-        arena.current_keys.return_value = []
+        arena.role.return_value = None # No projectiles
+        arena.collisions.side_effect = _collisions(grave)
+        _press(arena)
         arena.size.return_value = (500, 500)
 
         arthur = Arthur((242, 158))
@@ -657,6 +734,21 @@ class ArthurTest(unittest.TestCase):
 
 
 
+    def test_collision_order(self):
+        # What Arthur touches is handled in spawn order: once in the win area, he can't be hurt any more
+        enemy = unittest.mock.Mock(spec= Enemy)
+        win_area = unittest.mock.Mock(spec= BackgroundWinArea)
+        for others, armour in (((enemy, win_area), False), ((win_area, enemy), True)):
+            arena = unittest.mock.Mock()
+            arena.role.return_value = None # No projectiles
+            arena.collisions.side_effect = _collisions(*others)
+            _press(arena)
+            arena.size.return_value = (500, 500)
+
+            arthur = Arthur((100, 100))
+            arthur.move(arena)
+            self.assertEqual(armour, arthur._armour)
+
     def test_grave_from_left(self):
         grave = unittest.mock.Mock(spec= Grave)
         grave.pos.return_value = (242, 186)
@@ -667,8 +759,9 @@ class ArthurTest(unittest.TestCase):
         ground.size.return_value = (500, 20)
 
         arena = unittest.mock.Mock()
-        arena.collisions.return_value = [grave, ground]
-        arena.current_keys.return_value = []
+        arena.role.return_value = None # No projectiles
+        arena.collisions.side_effect = _collisions(grave, ground)
+        _press(arena)
         arena.size.return_value = (500, 500)
 
         arthur = Arthur((225, 171))
@@ -682,8 +775,9 @@ class ArthurTest(unittest.TestCase):
         platform.size.return_value = (100, 20)
 
         arena = unittest.mock.Mock()
-        arena.collisions.return_value = [platform]
-        arena.current_keys.return_value = []
+        arena.role.return_value = None # No projectiles
+        arena.collisions.side_effect = _collisions(platform)
+        _press(arena)
         arena.size.return_value = (1000, 1000)
 
         arthur = Arthur((678, 118))
@@ -700,9 +794,10 @@ class ArthurTest(unittest.TestCase):
         platform.size.return_value = (100, 20)
 
         arena = unittest.mock.Mock()
-        arena.collisions.return_value = [platform]
+        arena.role.return_value = None # No projectiles
+        arena.collisions.side_effect = _collisions(platform)
         arena.size.return_value = (1000, 1000)
-        arena.current_keys.return_value = []
+        _press(arena)
 
         a = Arthur((678, 152))
         a._dy = -15 # Simulo salto
@@ -712,5 +807,41 @@ class ArthurTest(unittest.TestCase):
 
         self.assertEqual((678, 91), a.pos())
 
+    def test_states(self):
+        arthur = Arthur((100, 100))
+        arena = unittest.mock.Mock()
+        arena.collisions.return_value = []
+        arena.count.return_value = 7
+
+        _press(arena, "a")
+        arthur._facing = LEFT
+        arthur.set_state(arena)
+        self.assertEqual("Running3Left", arthur.get_state())
+        self.assertEqual((421, 608), arthur.sprite())
+
+        _press(arena, "a", "d") # Both directions: idle, facing right
+        arthur.set_state(arena)
+        self.assertEqual("IdleRight", arthur.get_state())
+        arthur.lose_armour(arena)
+        self.assertEqual((134, 609 + 66), arthur.sprite())
+        self.assertEqual((20, 29), arthur.size())
+
+        arthur.die(arena)
+        arthur._dying_countdown = 10
+        arthur.set_state(arena)
+        self.assertEqual("Dead5Right", arthur.get_state())
+
+    def test_climbing_animation(self):
+        # Only the arrows animate the climb: with w and s, Arthur climbs in the same pose
+        arena = unittest.mock.Mock()
+        arena.collisions.return_value = []
+        arena.count.return_value = 4
+        arthur = Arthur((100, 100))
+        arthur._grabbing_ladder = True
+        for keys, state in ((("ArrowUp",), "ClimbingLeft"), (("s",), "ClimbingRight"), ((), "ClimbingRight")):
+            _press(arena, *keys)
+            arthur.set_state(arena)
+            self.assertEqual(state, arthur.get_state())
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
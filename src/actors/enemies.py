@@ -5,22 +5,20 @@ This project on GitHub: https://github.com/GioTFG/Ghosts-and-Goblins
 """
 
 from src.actors.platforms import Grave, BackgroundSolid, BackgroundPlatform
+from src.actors.projectiles import Projectiles, StraightProjectile
 from src.framework.actor import Actor, Arena, Point
-from random import randrange, randint
+import random
 from math import atan, sin, cos, pi
 
 FPS = 30
+HERO_ROLE = "hero" # Arena role of Arthur (see Arena.set_role)
 
 def get_hero(arena: Arena):
     """
     This method is used to get Arthur's position, so the enemy knows where to shoot its projectile.
     If Arthur doesn't exist, it returns None.
     """
-    from src.actors.arthur import Arthur # Lazy import per evitare import circolare
-    for a in arena.actors():
-        if isinstance(a, Arthur):
-            return a
-    return None
+    return arena.role(HERO_ROLE)
 
 
 class Enemy(Actor):
@@ -29,7 +27,7 @@ class Enemy(Actor):
     All the real actual methods will be used by the subclasses, this is only an interface.
     (I made this because I wanted to avoid multi-inheritance)
     """
-    pass
+    __slots__ = ()
 
 class Zombie(Enemy):
     """
@@ -72,19 +70,29 @@ class Zombie(Enemy):
         "Despawned": (0,0)
     }
 
-    def __init__(self, pos: Point, direction: str):
+    # Movement constants
+    _x_speed = 3
+    _gravity = 2
+    _max_dy = 8 # So it doesn't pass through when falling too fast
+    _walk_anim_countdown_start = 1 * FPS
+
+    __slots__ = ("_x", "_y", "_direction", "_dx", "_dy", "_distance", "_state", "_spawn_countdown",
+                 "_spawn_countdown_start", "_spawned", "_despawned", "_walk_anim_countdown")
+
+    def __init__(self, pos: Point, direction: str, rng: random.Random):
+        """
+        :param rng: Random number generator used for the spawning and walking times (the game's seeded one), so that
+        games can be replayed.
+        """
 
         ## - Position and movement
         self._x, self._y = pos
         self._direction: str = direction # It can only be "Right" or "Left"
         self._dx = 0
-        self._x_speed = 3
         self._dy = 0
-        self._gravity = 2
-        self._max_dy = 8 # So it doesn't pass through when falling too fast
 
         ## - Gameplay status
-        self._distance = randrange(150, 301) # How many pixels the Zombie must travel before despawning
+        self._distance = rng.randrange(150, 301) # How many pixels the Zombie must travel before despawning
         self._state = "Spawn" + direction
 
 
@@ -94,11 +102,10 @@ class Zombie(Enemy):
             Three number tuple: time (in frames) taken by each of the three stages of spawning of the Zombies
         """
 
-        self._walk_anim_countdown_start = 1 * FPS
         self._walk_anim_countdown = self._walk_anim_countdown_start
 
         # Spawn animation
-        self._spawn()
+        self._spawn(rng)
 
     def pos(self) -> tuple[float, float]:
         return self._x, self._y
@@ -115,6 +122,33 @@ class Zombie(Enemy):
             return self._sprites["Walk3" + self._direction]
 
     def move(self, arena: Arena):
+        # Far from Arthur, the arena may move the zombie only once every few ticks (see Arena.set_lod):
+        # then all the ticks elapsed since its last move are played now, one after the other, falling and landing too.
+        # The solids it touches are found by the arena for the first one; for the others, the ones it can reach in the
+        # meantime are looked up once, and at each tick only the ones touching it where it has got count.
+        elapsed = arena.elapsed()
+        if elapsed > 1:
+            # It walks at most _x_speed and falls at most _max_dy per tick, and no sprite is larger than 32 pixels
+            x, y = self.pos()
+            dx, dy = elapsed * self._x_speed, elapsed * self._max_dy
+            nearby = [(o, o.pos() + o.size()) for o in
+                      arena.statics_in((x - dx, y - 32), (2 * dx + 32, dy + 64), (BackgroundSolid, BackgroundPlatform))]
+        for i in range(elapsed):
+            if i == 0:
+                solids = arena.collisions((BackgroundSolid, BackgroundPlatform))
+            else: # As check_collision
+                x, y = self.pos()
+                w, h = self.size()
+                solids = [o for o, (ox, oy, ow, oh) in nearby if oy <= y + h and y <= oy + oh and ox <= x + w and x <= ox + ow]
+            if not self._step(arena, solids):
+                break
+
+    def _step(self, arena: Arena, solids: list[Actor]) -> bool:
+        """
+        A tick of the zombie.
+        :param solids: The solids and platforms it touches at the start of the tick.
+        :return: False if it is gone (despawned or fallen in a pit).
+        """
         if self._distance > 0: # If the zombies still hasn't travelled enough pixels...
             # The zombie has a tuple of frames for each state of spawning
             # For example, (100, 200, 50) means that the zombie, before walking has to:
@@ -146,8 +180,8 @@ class Zombie(Enemy):
         w, h = self.size()
 
         # Collisions
-        for other in arena.collisions():
-            if (isinstance(other, BackgroundSolid) or isinstance(other, BackgroundPlatform)) and not isinstance(other, Grave):
+        for other in solids:
+            if not isinstance(other, Grave):
                 other_x, other_y = other.pos()
 
                 if self._y + h + 1 > other_y and self._dy >= 0:
@@ -162,7 +196,8 @@ class Zombie(Enemy):
         sw, sh = self.size()
         aw, ah = arena.size()
 
-        if self._y + sh > ah: # Despawn if fallen in a pit
+        fallen = self._y + sh > ah
+        if fallen: # Despawn if fallen in a pit
             arena.kill(self)
 
         self._x = min(max(self._x, 0), aw - self.size()[0])
@@ -170,8 +205,9 @@ class Zombie(Enemy):
 
         # The state decides the sprite used for the next frame
         self._set_state()
+        return not (fallen or self._despawned)
 
-    def _spawn(self):
+    def _spawn(self, rng):
         """
         This method initializes the attributes for the zombie spawning animation
         """
@@ -179,7 +215,7 @@ class Zombie(Enemy):
         self._state = "Spawn1"
 
         # Each of the zombie's spawning stage takes a random amount of time from one to three seconds.
-        self._spawn_countdown = (randrange(1, 3), randrange(1, 3), randrange(1,4))
+        self._spawn_countdown = (rng.randrange(1, 3), rng.randrange(1, 3), rng.randrange(1,4))
         self._spawn_countdown = [c * FPS for c in self._spawn_countdown]
         self._spawn_countdown_start = self._spawn_countdown[:] # I save a copy of the generated tuple so that it can be reused for the despawning
 
@@ -248,16 +284,19 @@ class Plant(Enemy):
         "Shooting4Right": (654, 207)
     }
 
+    # The plant throws a projectile at random intervals of time, between _min_count and _max_count
+    _min_count, _max_count = 1, 10 # In seconds, then it will multiplied by the FPS
+    _projectile_speed = 4
+    _max_distance = 400
+
+    __slots__ = ("_x", "_y", "_shooting", "_shoot_countdown", "_current_start_shoot_countdown", "_state", "_direction")
+
     def __init__(self, pos: Point):
         self._x, self._y = pos
 
-        # The plant throws a projectile at random intervals of time, between min_count and max_count
-        self._min_count, self._max_count = 1, 10 # In seconds, then it will multiplied by the FPS
         self._shooting = False
         self._shoot_countdown = self._max_count * FPS # The first time, the plant waits the max amount of time before shooting
         self._current_start_shoot_countdown = self._shoot_countdown
-        self._projectile_speed = 4
-        self._max_distance = 400
 
         self._state, self._direction = "Idle", "Right"
 
@@ -273,6 +312,10 @@ class Plant(Enemy):
     def pos(self) -> Point:
         return self._x, self._y
 
+    def is_static(self) -> bool:
+        # The plant never moves, so the arena indexes it only once.
+        return True
+
     def move(self, arena: Arena):
         # The plant doesn't move, but if the hero exists, when the cooldown goes to 0 it shoots towards him.
 
@@ -312,7 +355,7 @@ class Plant(Enemy):
             Eyeball(self.pos(), (eyeball_dx, eyeball_dy), arena)
 
             # The countdown is actually in seconds, then multiplied by the FPS number to get the frames.
-            self._shoot_countdown = randint(self._min_count * FPS, self._max_count * FPS)
+            self._shoot_countdown = arena.random().randint(self._min_count * FPS, self._max_count * FPS)
             self._current_start_shoot_countdown = self._shoot_countdown
 
     def _set_state(self, arena: Arena):
@@ -326,37 +369,23 @@ class Plant(Enemy):
         else:
             self._state = "Shooting4"
 
-class Eyeball(Enemy):
+class Eyeball(Enemy, StraightProjectile):
     """
     The projectile shot by the plant at random intervals.
     Starts from the plant position and always moves at the same speed and direction.
+    Like all the projectiles, it is moved by the arena's Projectiles (see the projectiles module).
     """
-    def __init__(self, pos: Point, movement: Point, arena: Arena):
-        self._x, self._y = pos
-        self._dx, self._dy = movement
-        self._despawned = False
-        arena.spawn(self)
-
-    def pos(self):
-        return self._x, self._y
-
-    def move(self, arena: Arena):
-        self._x += self._dx
-        self._y += self._dy
+    SIZE = (10, 11)
 
-        # Despawning if outside the arena
-        aw, ah = arena.size()
-        if not 0 <= self._x <= aw or not 0 <= self._y <= ah:
-            self._despawned = True
-            arena.kill(self)
+    __slots__ = ()
+    def __init__(self, pos: Point, movement: Point, arena: Arena):
+        super().__init__(pos, movement)
+        Projectiles.of(arena).add(self, hostile=True)
 
     def sprite(self):
         spr = (575, 51) if self._dx < 0 else (721, 51)
         return spr
 
-    def size(self):
-        return 10, 11
-
 
 class Magician(Enemy):
     """
@@ -365,18 +394,22 @@ class Magician(Enemy):
     """
     SPRITE = (635, 0)
     SIZE = (17, 28)
+    _max_shooting_countdown = 3 * FPS
+    _shooting_speed = 3
+
+    __slots__ = ("_x", "_y", "_life", "_shooting_countdown", "_direction")
 
     def __init__(self, pos: Point):
         self._x, self._y = pos
         self._life = 10 * FPS # Automatically disappears after this number of frames
-        self._max_shooting_countdown = self._shooting_countdown = 3 * FPS
+        self._shooting_countdown = self._max_shooting_countdown
         self._direction = "Left"
-        self._shooting_speed = 3
 
     ## -- Inherited Methods --
     def pos(self): return self._x, self._y
     def size(self): return self.SIZE
     def sprite(self): return self.SPRITE
+    def is_static(self): return True # It never moves
 
     def move(self, arena: Arena):
         if (hero := get_hero(arena)) is not None:
@@ -397,12 +430,13 @@ class Magician(Enemy):
     def shoot(self, arena: Arena):
         projectile_dx = self._shooting_speed if self._direction == "Right" else -self._shooting_speed
         magic_projectile = MagicProjectile(self.pos(), projectile_dx)
-        arena.spawn(magic_projectile)
+        Projectiles.of(arena).add(magic_projectile, hostile=True)
 
 class MagicProjectile(Enemy):
     """
     The magic projectile shot by the magician every two seconds.
     When it hits Arthur, it turns him into a frog.
+    It is moved by the arena's Projectiles.
     """
     SPRITES = [
         (226, 803),
@@ -410,6 +444,8 @@ class MagicProjectile(Enemy):
     ]
     SIZE = (11, 11)
 
+    __slots__ = ("_x", "_y", "_dx", "_life", "_anim_count")
+
     def __init__(self, pos: Point, dx: int):
         self._x, self._y = pos
         self._dx = dx
@@ -431,20 +467,26 @@ class MagicProjectile(Enemy):
         if self._life > 0:
             self._life -= 1
         else:
-            arena.kill(self)
+            Projectiles.of(arena).kill(self)
 
         self._x += self._dx
 
 # -- TESTING CLASSES --
 import unittest, unittest.mock
 
+def _collisions(*actors):
+    """
+    Side effect for a mocked arena.collisions, that filters the actors by kind as Arena.collisions does.
+    """
+    return lambda kind=None: [a for a in actors if kind is None or isinstance(a, kind)]
+
 class PlantTest(unittest.TestCase):
     def test_not_moving(self):
         arena = unittest.mock.Mock()
         arena.collisions.return_value = []
         arena.current_keys.return_value = []
         arena.size.return_value = (500, 500)
-        arena.actors.return_value = []
+        arena.role.side_effect = {}.get
 
         p = Plant((250, 250))
 
@@ -468,7 +510,7 @@ class PlantTest(unittest.TestCase):
         p = Plant((250, 250))
 
         with self.subTest("Not shooting at Arthur"):
-            arena.actors.return_value = [arthur, p]
+            arena.role.side_effect = {HERO_ROLE: arthur}.get
             prev_shooting_countdown = p._shoot_countdown
             for i in range(100):
                 p.move(arena)
@@ -477,14 +519,14 @@ class PlantTest(unittest.TestCase):
 
 
         with self.subTest("Shooting even if Arthur is not present"):
-            arena.actors.return_value = [p]
+            arena.role.side_effect = {}.get
             prev_shooting_countdown = p._shoot_countdown
             for i in range(100):
                 p.move(arena)
                 self.assertEqual(prev_shooting_countdown, p._shoot_countdown, i)
                 prev_shooting_countdown = p._shoot_countdown
 
-        arena.actors.return_value = [p, arthur]
+        arena.role.side_effect = {HERO_ROLE: arthur}.get
         arthur.has_won.return_value = True
 
         with self.subTest("Shooting even if Arthur has won"):
@@ -538,14 +580,15 @@ class ZombieTest(unittest.TestCase):
         arena = unittest.mock.Mock(spec= Arena)
         arena.current_keys.return_value = []
         arena.size.return_value = (1000, 1000)
+        arena.elapsed.return_value = 1
 
         ground = unittest.mock.Mock(spec= BackgroundSolid)
         ground.pos.return_value = (0, 532)
         ground.size.return_value = (1000, 100)
 
-        arena.collisions.return_value = [ground]
+        arena.collisions.side_effect = _collisions(ground)
 
-        z = Zombie((500, 500), "Right")
+        z = Zombie((500, 500), "Right", random.Random(0))
         spawning_counts = z._spawn_countdown
         x, y = z.pos()
 
@@ -561,5 +604,50 @@ class ZombieTest(unittest.TestCase):
             x, y = z.pos()
         self.assertNotEqual(500, x)
 
+    def test_elapsed(self):
+        # A zombie moved every 4 ticks (see Arena.set_lod) ends up as one moved at every tick
+        arena = unittest.mock.Mock(spec= Arena)
+        arena.size.return_value = (1000, 1000)
+        ground = unittest.mock.Mock(spec= BackgroundSolid)
+        ground.pos.return_value = (0, 532)
+        ground.size.return_value = (1000, 100)
+        arena.collisions.return_value = arena.statics_in.return_value = [ground]
+        rng = random.Random(1)
+        every, sometimes = Zombie((500, 500), "Right", rng), Zombie((500, 500), "Right", random.Random(1))
+        for i in range(200):
+            arena.elapsed.return_value = 1
+            every.move(arena)
+            if i % 4 == 3:
+                arena.elapsed.return_value = 4
+                sometimes.move(arena)
+        self.assertEqual(every.pos(), sometimes.pos())
+        self.assertEqual(every._spawn_countdown, sometimes._spawn_countdown)
+        self.assertEqual(every._walk_anim_countdown, sometimes._walk_anim_countdown)
+
+    def test_elapsed_falling(self):
+        # The zombie falls from the sky, lands, then walks off the ledge onto a lower ground:
+        # far from the focus it is moved every 4 ticks, and it must fall and land as one moved at every tick
+        from src.actors.platforms import Ground
+        zombies = []
+        for lod in (False, True):
+            arena = Arena((1000, 300))
+            arena.spawn(Ground((0, 200), (560, 40)))
+            arena.spawn(Ground((560, 260), (440, 40)))
+            if lod:
+                arena.set_lod(Zombie, 0, 4)
+            zombies.append((arena, Zombie((500, 20), "Right", random.Random(2))))
+            arena.spawn(zombies[-1][1])
+
+        (arena, every), (lod_arena, sometimes) = zombies
+        for i in range(400):
+            lod_arena.set_lod_focus((0, 0) if i % 10 else None) # Every 10 ticks, it catches up
+            arena.tick()
+            lod_arena.tick()
+            if i % 10 == 0:
+                self.assertEqual(arena.is_alive(every), lod_arena.is_alive(sometimes))
+                self.assertEqual(every.pos(), sometimes.pos(), f"tick {i}")
+                self.assertEqual(every.size(), sometimes.size())
+        self.assertGreater(every.pos()[1], 200) # It got down to the lower ground
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
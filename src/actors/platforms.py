@@ -4,21 +4,18 @@ Module created by Giovanni Ancora for a project at UniPr.
 This project on GitHub: https://github.com/GioTFG/Ghosts-and-Goblins
 """
 
+from src.actors.projectiles import PROJECTILES_ROLE
 from src.framework.actor import Actor, Arena, Point
 
 FPS = 30
 
-def check_if_hit(arena: Arena):
+def check_if_hit(arena: Arena, tomb: "Grave"):
     """
     Checks if the tomb has been hit by a player projectile. In that case returns True. Otherwise, False.
     """
 
-    from src.actors.weapons import Weapon # Lazy import to avoid circular import
-
-    for a in arena.collisions():
-        if isinstance(a, Weapon):
-            return True
-    return False
+    projectiles = arena.role(PROJECTILES_ROLE) # Weapons are moved by the arena's Projectiles
+    return projectiles is not None and bool(projectiles.weapons_touching(tomb))
 
 
 class BackgroundActor(Actor):
@@ -26,6 +23,8 @@ class BackgroundActor(Actor):
     Generic class for an actor which has collisions but doesn't have a sprite, because it is already rendered
     in the background image.
     """
+    __slots__ = ("_x", "_y", "_w", "_h")
+
     def __init__(self, pos: Point, size: Point):
         self._x, self._y = pos
         self._w, self._h = size
@@ -42,6 +41,10 @@ class BackgroundActor(Actor):
     def sprite(self):
         return None
 
+    def is_static(self) -> bool:
+        # Background actors never move, so the arena indexes them only once.
+        return True
+
     def is_jumpable(self) -> bool:
         """
         Returns if the actor (Arthur) can jump off of the platform.
@@ -64,31 +67,40 @@ I chose this rather than creating an attribute because they are more flexible fo
 (For example, the is_jumpable method).
 """
 class BackgroundPlatform(BackgroundActor):
+    __slots__ = ()
+
     def is_jumpable(self) -> bool:
         return True
 
 class BackgroundSolid(BackgroundActor):
+    __slots__ = ()
+
     def is_jumpable(self) -> bool:
         return True
 
 class Grave(BackgroundSolid):
+    _max_hit_cooldown = 1 * FPS
+
+    __slots__ = ("_times_hit", "_hit_cooldown")
+
     def __init__(self, pos: Point, size: Point):
         super().__init__(pos, size)
 
         # Everytime a tomb is hit by a weapon (with a cooldown), this counter increments.
         # When it reaches 15, it spawns the magician.
         self._times_hit = 0
-        self._max_hit_cooldown = self._hit_cooldown = 1 * FPS
+        self._hit_cooldown = self._max_hit_cooldown
 
     def move(self, arena: Arena):
         super().move(arena)
 
         if self._hit_cooldown == 0:
-            if check_if_hit(arena):
+            if check_if_hit(arena, self):
                 self._hit_cooldown = self._max_hit_cooldown
                 self._times_hit += 1
         else:
-            self._hit_cooldown -= 1
+            # Far from Arthur, the grave may be moved only once every few ticks (see Arena.set_lod)
+            self._hit_cooldown = max(self._hit_cooldown - arena.elapsed(), 0)
 
         if self._times_hit >= 15:
             self._times_hit = 0
@@ -100,13 +112,13 @@ class Grave(BackgroundSolid):
         arena.spawn(m)
 
 class Ground(BackgroundSolid):
-    pass
+    __slots__ = ()
 
 class BackgroundLadder(BackgroundActor):
-    pass
+    __slots__ = ()
 
 class BackgroundWinArea(BackgroundLadder):
     """
     If Arthur collides with this area, the game is won.
     """
-    pass
\ No newline at end of file
+    __slots__ = ()
\ No newline at end of file
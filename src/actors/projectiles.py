@@ -0,0 +1,357 @@
+"""
+Module created by Giovanni Ancora for a project at UniPr.
+@author Giovanni Ancora (https://github.com/GioTFG and https://github.com/GiovanniAncora)
+This project on GitHub: https://github.com/GioTFG/Ghosts-and-Goblins
+"""
+
+from src.framework.actor import Actor, Arena, Point
+
+PROJECTILES_ROLE = "projectiles" # Arena role of the Projectiles actor (see Arena.set_role)
+
+
+def kill_actor(arena: Arena, a: Actor) -> bool:
+    """
+    Kills an actor of the arena or a projectile (used by the weapons, that kill both).
+    :return: True if it was alive, so that an enemy killed twice in the same tick can be counted once.
+    """
+    projectiles = arena.role(PROJECTILES_ROLE)
+    if projectiles is not None and projectiles.is_alive(a):
+        projectiles.kill(a)
+        return True
+    alive = arena.is_alive(a)
+    arena.kill(a)
+    return alive
+
+
+class StraightProjectile(Actor):
+    """
+    A projectile that moves in a straight line at a constant speed, until it leaves the arena (e.g. the Eyeball).
+    Projectiles moves all of them in a single loop, without calling their move: it is only used to move one on its own.
+    """
+    SIZE = (0, 0)
+
+    __slots__ = ("_x", "_y", "_dx", "_dy", "_despawned")
+
+    def __init__(self, pos: Point, movement: Point):
+        self._x, self._y = pos
+        self._dx, self._dy = movement
+        self._despawned = False # Set when it leaves the arena
+
+    def pos(self) -> Point:
+        return self._x, self._y
+
+    def size(self) -> Point:
+        return self.SIZE
+
+    def move(self, arena: Arena):
+        self._x += self._dx
+        self._y += self._dy
+
+        # Despawning if outside the arena
+        aw, ah = arena.size()
+        if not 0 <= self._x <= aw or not 0 <= self._y <= ah:
+            self._despawned = True
+            Projectiles.of(arena).kill(self)
+
+
+class Projectiles(Actor):
+    """
+    A single actor that moves all the projectiles of an arena (Eyeball, MagicProjectile, Torch, Flame) in one turn.
+
+    Projectiles are many, small and short-lived, and each of them only cares about a few other actors,
+    so they are not spawned in the arena one by one, where they would all go through its collision detection:
+    - the straight projectiles (see StraightProjectile) are moved together in a single loop, the others by their move;
+    - their boxes are kept in two flat lists (enemy projectiles and weapons), built while moving them, so that Arthur can ask for the enemy projectiles
+      hitting him (see hits) and graves for the weapons touching them (see weapons_touching);
+    - what the weapons touch is looked up once per tick, at the start of this actor's turn (see collisions), through
+      Arena.actors_in.
+    As with Arena.collisions, all of them are found where they were at the start of the tick, whether this actor
+    moved before or after the one asking.
+    The renderer gets them through actors_in, just like the actors of the arena.
+    This actor itself is static and has no size, so the arena never checks it for collisions.
+    """
+    __slots__ = ("_arena", "_hostile", "_weapons", "_straight", "_last_seq", "_killed", "_killed_at", "_boxes",
+                 "_start_boxes", "_moved_at", "_touching")
+
+    @staticmethod
+    def of(arena: Arena) -> "Projectiles":
+        """
+        Returns the Projectiles of the arena, spawning it the first time (and after it has been killed).
+        """
+        projectiles = arena.role(PROJECTILES_ROLE)
+        if projectiles is None:
+            projectiles = Projectiles(arena)
+            arena.spawn(projectiles)
+            arena.set_role(PROJECTILES_ROLE, projectiles)
+        return projectiles
+
+    def __init__(self, arena: Arena):
+        self._arena = arena
+        self._hostile = {} # Enemy projectile -> spawn order
+        self._weapons = {} # Weapon -> spawn order
+        self._straight = {} # Straight projectiles (of both groups), moved together
+        self._last_seq = 0
+        self._killed = {} # Projectile killed in the tick _killed_at -> its group and spawn order
+        self._killed_at = -1
+        # (projectile, left, top, right, bottom) for the enemy projectiles and for the weapons, where they are now
+        self._boxes = [], []
+        self._start_boxes = [], [] # The same, where they were before this actor's last turn
+        self._moved_at = -1 # Tick of this actor's last turn
+        self._touching = {} # Weapon -> actors and enemy projectiles it touched at the start of the tick
+
+    def add(self, p: Actor, hostile: bool):
+        """
+        Adds a projectile. It starts moving from the next turn, as an actor spawned in the arena.
+        :param p: The projectile.
+        :param hostile: True if it is an enemy projectile, that can hit Arthur, False if it is a weapon.
+        """
+        self._last_seq += 1
+        if hostile:
+            self._hostile[p] = self._last_seq
+        else:
+            self._weapons[p] = self._last_seq
+        if isinstance(p, StraightProjectile):
+            self._straight[p] = None
+        x, y, w, h = p.pos() + p.size()
+        self._boxes[0 if hostile else 1].append((p, x, y, x + w, y + h))
+
+    def kill(self, p: Actor):
+        """
+        Removes a projectile (if it is not a projectile of this batch, nothing happens).
+        As an actor killed in the arena, it can still be touched until the end of the tick (see hits).
+        """
+        for group in (self._hostile, self._weapons):
+            seq = group.pop(p, None)
+            if seq is not None:
+                count = self._arena.count()
+                if self._killed_at != count:
+                    self._killed, self._killed_at = {}, count
+                self._killed[p] = group, seq
+        self._straight.pop(p, None)
+
+    def is_alive(self, p: Actor) -> bool:
+        return p in self._hostile or p in self._weapons
+
+    # -- INHERITED METHODS --
+    def move(self, arena: Arena):
+        # What each weapon touches is found before anything moves, like Arena does with collisions
+        self._touching = self._touched_by_weapons(arena)
+        # For the rest of the tick, the projectiles are found where they are now (see hits)
+        self._start_boxes, self._moved_at = self._boxes, arena.count()
+        self._boxes = [], []
+
+        # Straight projectiles, all in one loop
+        aw, ah = arena.size()
+        hostile, left = self._hostile, []
+        for p in self._straight:
+            x, y = p._x + p._dx, p._y + p._dy
+            p._x, p._y = x, y
+            if 0 <= x <= aw and 0 <= y <= ah:
+                w, h = p.SIZE
+                self._boxes[0 if p in hostile else 1].append((p, x, y, x + w, y + h))
+            else:
+                left.append(p)
+        for p in left:
+            p._despawned = True
+            self.kill(p)
+
+        # The others, one by one
+        straight = self._straight
+        for group, boxes in zip((self._hostile, self._weapons), self._boxes):
+            for p in list(group):
+                if p not in straight and p in group: # It may have been killed by a weapon moved before it
+                    p.move(arena)
+                    if p in group:
+                        x, y, w, h = p.pos() + p.size()
+                        boxes.append((p, x, y, x + w, y + h))
+
+    def pos(self) -> Point:
+        return 0, 0
+
+    def size(self) -> Point:
+        return 0, 0 # It is not a physical actor: the projectiles have their own positions and sizes
+
+    def sprite(self) -> Point | None:
+        return None
+
+    def is_static(self) -> bool:
+        return True # Its position and size never change: the projectiles have their own
+
+    # -- QUERIES --
+    def hits(self, a: Actor) -> list[Actor]:
+        """
+        Returns the enemy projectiles touching an actor (usually Arthur), in spawn order.
+        As in Arena.collisions, the projectiles are where they were at the start of the tick.
+        """
+        return self._touching_in(self._hostile, a)
+
+    def collisions(self, w: Actor, kind: type | tuple[type, ...] = None) -> list[Actor]:
+        """
+        Returns what a weapon of this batch touched at the start of the tick: the actors of the arena first,
+        then the enemy projectiles.
+        :param kind: If given, only the actors of this class (or tuple of classes) are returned, as in Arena.collisions.
+        """
+        touching = self._touching.get(w, [])
+        if kind is None:
+            return touching
+        return [o for o in touching if isinstance(o, kind)]
+
+    def weapons_touching(self, a: Actor) -> list[Actor]:
+        """
+        Returns the weapons touching an actor (for example a Grave), in spawn order.
+        As in hits, the weapons are where they were at the start of the tick.
+        """
+        return self._touching_in(self._weapons, a)
+
+    def actors_in(self, pos: Point, size: Point) -> list[Actor]:
+        """
+        Returns the projectiles touching the rectangle (e.g. the visible part of the arena), to be drawn.
+        Enemy projectiles come first, then weapons, each in spawn order.
+        """
+        x, y, w, h = pos + size
+        def touches(p: Actor) -> bool:
+            px, py, pw, ph = p.pos() + p.size()
+            return py <= y + h and y <= py + ph and px <= x + w and x <= px + pw
+        return [p for p in self._hostile if touches(p)] + [p for p in self._weapons if touches(p)]
+
+    def projectiles(self) -> list[Actor]:
+        """
+        Returns a copy of the list of projectiles.
+        """
+        return list(self._hostile) + list(self._weapons)
+
+    # -- UTILITY METHODS --
+    def _touching_in(self, group: dict, a: Actor) -> list[Actor]:
+        # Once this actor moved in the current tick, the projectiles are looked up where they were before;
+        # the ones killed in this tick are still there
+        count = self._arena.count()
+        boxes = (self._start_boxes if self._moved_at == count else self._boxes)[0 if group is self._hostile else 1]
+        killed = self._killed if self._killed_at == count else {}
+        x, y, w, h = a.pos() + a.size()
+        right, bottom = x + w, y + h
+        found = {} # Projectile -> spawn order
+        for p, px, py, pright, pbottom in boxes:
+            if py <= bottom and y <= pbottom and px <= right and x <= pright:
+                seq = group.get(p)
+                if seq is None:
+                    killed_group, seq = killed.get(p, (None, 0))
+                    if killed_group is not group:
+                        continue
+                found[p] = seq
+        return sorted(found, key=found.__getitem__)
+
+    def _touched_by_weapons(self, arena: Arena) -> dict[Actor, list[Actor]]:
+        """
+        Finds what each weapon touches: the actors of the arena (where they were at the start of the tick, see
+        Arena.actors_in), then the enemy projectiles.
+        """
+        return {w: arena.actors_in(w.pos(), w.size()) + self.hits(w) for w in self._weapons}
+
+
+# TESTING
+import unittest
+
+class ProjectilesTest(unittest.TestCase):
+    def test_eyeballs(self):
+        from src.actors.enemies import Eyeball, Plant
+        arena = Arena((300, 300))
+        eyes = [Eyeball((100, 100), (10, 0), arena), Eyeball((100, 150), (-60, 0), arena)]
+        projectiles = Projectiles.of(arena)
+        self.assertIs(projectiles, Projectiles.of(arena))
+        self.assertEqual(eyes, projectiles.projectiles())
+        self.assertEqual([projectiles], arena.actors())
+
+        arena.tick()
+        self.assertEqual((110, 100), eyes[0].pos())
+        arena.tick()
+        self.assertFalse(projectiles.is_alive(eyes[1])) # Went out of the arena
+        self.assertEqual([eyes[0]], projectiles.projectiles())
+
+        target = Plant((125, 95))
+        self.assertEqual([eyes[0]], projectiles.hits(target))
+        self.assertEqual([eyes[0]], projectiles.actors_in((0, 0), (150, 150)))
+
+    def test_torch_kills_eyeball(self):
+        from src.actors.enemies import Enemy, Eyeball
+        from src.actors.weapons import Torch
+        arena = Arena((300, 300))
+        eye = Eyeball((100, 100), (0, 0), arena)
+        torch = Torch("Right", (95, 95))
+        Projectiles.of(arena).add(torch, hostile=False)
+
+        arena.tick()
+        self.assertEqual([eye], Projectiles.of(arena).collisions(torch, Enemy))
+        self.assertEqual([], Projectiles.of(arena).projectiles())
+
+    def test_not_a_body(self):
+        arena = Arena((300, 300))
+        Projectiles.of(arena)
+        self.assertEqual([], arena.actors_in((0, 0), (10, 10))) # It is at (0, 0), but it touches nothing
+
+    def test_weapons_touching(self):
+        from src.actors.enemies import Plant
+        from src.actors.weapons import Torch
+        arena = Arena((300, 300))
+        plant = Plant((100, 100))
+        arena.spawn(plant)
+        near, far = Torch("Right", (95, 95)), Torch("Right", (250, 20))
+        projectiles = Projectiles.of(arena)
+        projectiles.add(near, hostile=False)
+        projectiles.add(far, hostile=False)
+
+        arena.tick()
+        self.assertEqual([plant], projectiles.collisions(near))
+        self.assertEqual([], projectiles.collisions(far))
+
+    def test_torch_kills_plant(self):
+        from src.actors.enemies import Plant
+        from src.actors.weapons import Torch
+        arena = Arena((300, 300)) # A plain arena, that doesn't count the kills
+        plant = Plant((100, 100))
+        arena.spawn(plant)
+        torch = Torch("Right", (95, 95))
+        Projectiles.of(arena).add(torch, hostile=False)
+
+        arena.tick()
+        arena.tick()
+        self.assertFalse(arena.is_alive(plant))
+        self.assertEqual([], Projectiles.of(arena).projectiles())
+
+    def test_hits_at_start_of_tick(self):
+        from src.actors.enemies import Eyeball, Plant
+        # Whether the target moves before or after the batch, it is hit by where the eyeball was at the start of the tick
+        class _Target(Plant):
+            def move(self, arena: Arena):
+                hits.append((arena.count(), tuple(Projectiles.of(arena).hits(self))))
+
+        for target_first in (True, False):
+            arena = Arena((300, 300))
+            target = _Target((100, 100))
+            if target_first: # Spawned before the batch, it moves after it
+                arena.spawn(target)
+            eye = Eyeball((60, 100), (20, 0), arena) # It touches the target from the second tick on
+            if not target_first:
+                arena.spawn(target)
+            hits = []
+            for _ in range(3):
+                arena.tick()
+            self.assertEqual([(0, ()), (1, ()), (2, (eye,))], hits)
+
+    def test_killed_still_touching(self):
+        from src.actors.platforms import Grave
+        from src.actors.weapons import Torch
+        arena = Arena((300, 300))
+        grave = Grave((100, 100), (16, 16))
+        grave._hit_cooldown = 0
+        arena.spawn(grave) # It moves after the batch, where the torch hits it and disappears
+        torch = Torch("Right", (95, 95))
+        Projectiles.of(arena).add(torch, hostile=False)
+
+        arena.tick()
+        self.assertFalse(Projectiles.of(arena).is_alive(torch))
+        self.assertEqual(1, grave._times_hit) # As in Arena, it still touched the grave in the tick it was killed
+        arena.tick()
+        self.assertEqual([], Projectiles.of(arena).weapons_touching(grave))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,6 +6,7 @@ This project on GitHub: https://github.com/GioTFG/Ghosts-and-Goblins
 
 from src.actors.platforms import Ground, BackgroundSolid, BackgroundPlatform
 from src.actors.enemies import Enemy
+from src.actors.projectiles import Projectiles
 from src.framework.actor import Actor, Point, Arena
 
 FPS = 30
@@ -13,8 +14,9 @@ FPS = 30
 class Weapon(Actor):
     """
     Generic class to group all the weapons together in a common class.
+    Weapons are moved by the arena's Projectiles, that also tells them what they touch.
     """
-    pass
+    __slots__ = ()
 
 
 class Torch (Weapon):
@@ -25,6 +27,10 @@ class Torch (Weapon):
     If it collides with a gravestone, it just disappears.
     If it falls on the ground, it creates a flame that stays on the ground for a few seconds and kills any enemy that touches it.
     """
+    _gravity = 2
+    _max_dy = 8
+
+    __slots__ = ("_x", "_y", "_direction", "_dx", "_dy", "_anim_count")
 
     def __init__(self, direction: str, pos: Point):
         # Movement
@@ -32,8 +38,6 @@ class Torch (Weapon):
         self._direction = direction
         self._dx = 8 if direction == "Right" else -8
         self._dy = -10
-        self._gravity = 2
-        self._max_dy = 8
 
         # Animations
         self._anim_count = 0
@@ -53,28 +57,29 @@ class Torch (Weapon):
         else: return 13, 14
 
     def move(self, arena: Arena):
+        projectiles = Projectiles.of(arena)
         self._x += self._dx
         self._y += self._dy
 
         # Collisions
-        for o in arena.collisions():
-            if isinstance(o, Enemy): # Enemies get killed when hit by the torch
-                #DEVLOG: Qui ho imparato che se lo zombie è stato creato in un altro modulo e l'import è diverso rispetto a quello che ho fatto
-                #        per poter usare "Zombie" qui nell'instance of (tipo in game, dove c'era from actors.zombie import Zombie
-                #        e qui from src.actors.zombie import Zombie, l'instanceof non li considera della stessa classe perché usano
-                #        diverso namespace.
+        for o in projectiles.collisions(self, Enemy): # Enemies get killed when hit by the torch
+            #DEVLOG: Qui ho imparato che se lo zombie è stato creato in un altro modulo e l'import è diverso rispetto a quello che ho fatto
+            #        per poter usare "Zombie" qui nell'instance of (tipo in game, dove c'era from actors.zombie import Zombie
+            #        e qui from src.actors.zombie import Zombie, l'instanceof non li considera della stessa classe perché usano
+            #        diverso namespace.
 
-                arena.kill(o)
-                arena.kill(self)
+            if not arena.kill_enemy(o): # Enemy projectiles are not in the arena, unless it kills them itself (see GngGame)
+                projectiles.kill(o)
+            projectiles.kill(self)
 
-            elif isinstance(o, Ground) or isinstance(o, BackgroundPlatform): # If the torch touches the ground, it creates a flame
-                self._ground_collision(arena, o)
+        for o in projectiles.collisions(self, (Ground, BackgroundPlatform)): # If the torch touches the ground, it creates a flame
+            self._ground_collision(arena, o)
 
-            elif isinstance(o, BackgroundSolid): # If I touched anything else, I disappear
-                arena.kill(self)
+        if projectiles.collisions(self, BackgroundSolid): # If I touched anything else, I disappear
+            projectiles.kill(self)
 
         aw, ah = arena.size()
-        if self._y > ah: arena.kill(self)
+        if self._y > ah: projectiles.kill(self)
 
         self._dy = min(self._dy + self._gravity, self._max_dy)
 
@@ -91,13 +96,15 @@ class Torch (Weapon):
         gx, gy = other.pos()
 
         cx = x + w / 2 # Centre pixel of the torch
-        arena.spawn(Flame((cx, gy))) # The collision point with the ground must be passed as coordinates.
-        arena.kill(self) # The torch disappears
+        projectiles = Projectiles.of(arena)
+        projectiles.add(Flame((cx, gy)), hostile=False) # The collision point with the ground must be passed as coordinates.
+        projectiles.kill(self) # The torch disappears
 
 class Flame (Weapon):
     """
     The flame created by the torch upon hitting the ground.
     """
+    __slots__ = ("_start_x", "_start_y", "_x", "_y", "_life", "_anim_count")
 
     def __init__(self, ground_pos: Point):
         # Movement
@@ -132,11 +139,13 @@ class Flame (Weapon):
         self._y = self._start_y - h
 
         # Enemies touched get killed
-        for o in arena.collisions():
-            if isinstance(o, Enemy): arena.kill(o)
+        projectiles = Projectiles.of(arena)
+        for o in projectiles.collisions(self, Enemy):
+            if not arena.kill_enemy(o): # As for the torch
+                projectiles.kill(o)
 
         # Despawning logic
         if self._life > 0:
             self._life -= 1
         else:
-            arena.kill(self)
\ No newline at end of file
+            projectiles.kill(self)
\ No newline at end of file
@@ -4,11 +4,20 @@
 @license This software is free - https://opensource.org/license/mit
 """
 
+import atexit, json, sys
+from collections.abc import Iterable
+from random import Random
+from time import perf_counter
+
 Point = tuple[float, float]
 
 class Actor:
     """Interface to be implemented by each game character.
+    Subclasses declare their attributes in `__slots__`, as games can
+    have thousands of actors.
     """
+    __slots__ = ()
+
     def move(self, arena: "Arena"):
         """Called by Arena, at the actor’s turn.
         """
@@ -31,6 +40,13 @@ class Actor:
         """
         raise NotImplementedError("Abstract method")
 
+    def is_static(self) -> bool:
+        """Return True if the actor never changes its position or size.
+        Static actors are indexed by Arena only once, when spawned;
+        if their size is (0, 0), they never collide.
+        """
+        return False
+
 
 def check_collision(a1: Actor, a2: Actor) -> bool:
     """Check two actors (args) for mutual collision or contact,
@@ -53,87 +69,572 @@ def check_overlap(a1: Actor, a2: Actor) -> bool:
             x2 < x1 + w1 and x1 < x2 + w2)
 
 
+class InputSnapshot:
+    """The input of a tick: the keys pressed in it and in the previous
+    one, and the actions they trigger, as bitmasks (see
+    `Arena.set_actions`). It never changes, so it can be kept.
+    """
+    __slots__ = ("_keys", "_prev_keys", "_bits", "_down", "_prev_down")
+
+    def __init__(self, keys, prev_keys, bits: dict[str, int],
+                 key_actions: dict[str, int]):
+        """`bits` maps each action to its bit, `key_actions` each key
+        to the bits of the actions it triggers.
+        """
+        self._keys, self._prev_keys = frozenset(keys), frozenset(prev_keys)
+        self._bits = bits
+        self._down = self._prev_down = 0
+        for k in self._keys:
+            self._down |= key_actions.get(k, 0)
+        for k in self._prev_keys:
+            self._prev_down |= key_actions.get(k, 0)
+
+    def down(self, action: str) -> bool:
+        """Return True if some key of `action` is pressed. Unknown
+        actions are never down.
+        """
+        return bool(self._down & self._bits.get(action, 0))
+
+    def pressed(self, action: str) -> bool:
+        """Return True if `action` is down, but was not at last tick.
+        """
+        return bool(self._down & ~self._prev_down & self._bits.get(action, 0))
+
+    def released(self, action: str) -> bool:
+        """Return True if `action` was down at last tick, but is not.
+        """
+        return bool(self._prev_down & ~self._down & self._bits.get(action, 0))
+
+    def mask(self) -> int:
+        """Return the bits of the actions down.
+        """
+        return self._down
+
+    def key_down(self, key: str) -> bool:
+        return key in self._keys
+
+    def keys(self) -> frozenset[str]:
+        return self._keys
+
+    def previous_keys(self) -> frozenset[str]:
+        return self._prev_keys
+
+
+def _touches(a: Actor, rect: tuple) -> bool:
+    """Check whether actor `a` touches the (x, y, w, h) rectangle,
+    as `check_collision` does with two actors.
+    """
+    return _rects_touch(a.pos() + a.size(), rect)
+
+def _rects_touch(r1: tuple, r2: tuple) -> bool:
+    x1, y1, w1, h1 = r1
+    x2, y2, w2, h2 = r2
+    return y2 <= y1 + h1 and y1 <= y2 + h2 and x2 <= x1 + w1 and x1 <= x2 + w2
+
+class _KindMatch(dict):
+    """Memo of which actor classes belong to `kind`
+    (a class or a tuple of classes, as in `isinstance`).
+    """
+    def __init__(self, kind):
+        super().__init__()
+        self._kind = kind
+
+    def __missing__(self, cls):
+        self[cls] = result = issubclass(cls, self._kind)
+        return result
+
+
+class TickProfile():
+    """Cumulative and last-tick wall time and call count of each
+    actor class's `move`, and of the collision phase.
+    """
+    COLLISIONS = "<collisions>"
+
+    def __init__(self):
+        self._ticks = 0
+        self._total = {}  # name -> [calls, seconds]
+        self._last = {}  # same, for the last tick only
+
+    def add(self, name: str, seconds: float, calls: int=1):
+        entry = self._last.get(name)
+        if entry is None:
+            entry = self._last[name] = [0, 0.0]
+        entry[0] += calls
+        entry[1] += seconds
+
+    def end_tick(self):
+        for name, (calls, seconds) in self._last.items():
+            total = self._total.setdefault(name, [0, 0.0])
+            total[0] += calls
+            total[1] += seconds
+        self._ticks += 1
+
+    def start_tick(self):
+        self._last = {}
+
+    def ticks(self) -> int:
+        return self._ticks
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        """Return, for each actor class name (and for `COLLISIONS`):
+        total calls and ms, calls and ms in the last tick, mean ms per tick.
+        Entries are sorted by total time, the most expensive first.
+        """
+        result = {}
+        for name, (calls, seconds) in sorted(self._total.items(), key=lambda e: -e[1][1]):
+            last_calls, last_seconds = self._last.get(name, (0, 0.0))
+            result[name] = {"calls": calls, "total_ms": seconds * 1000,
+                            "last_calls": last_calls, "last_ms": last_seconds * 1000,
+                            "ms_per_tick": seconds * 1000 / max(self._ticks, 1)}
+        return result
+
+    def report(self) -> str:
+        """Return the stats as a text table.
+        """
+        lines = [f"{self._ticks} ticks",
+                 f"{'name':>20} {'calls':>9} {'total ms':>10} {'ms/tick':>9} {'last ms':>9}"]
+        for name, s in self.stats().items():
+            lines.append(f"{name:>20} {s['calls']:>9} {s['total_ms']:>10.2f} "
+                         f"{s['ms_per_tick']:>9.4f} {s['last_ms']:>9.4f}")
+        return "\n".join(lines)
+
+    def dump(self, path: str=None):
+        """Write the stats as JSON to `path`, or the report to stderr if None.
+        """
+        if path is None:
+            print(self.report(), file=sys.stderr)
+        else:
+            with open(path, "w") as f:
+                json.dump({"ticks": self._ticks, "stats": self.stats()}, f, indent=2)
+
+
 class Arena():
     """A generic 2D game, with a given size in pixels and a list of actors.
+    Static actors (see `Actor.is_static`) are kept in a spatial index
+    built at spawn time; the other actors are kept in a grid too, where
+    they are refiled at each tick if they moved.
+    Actors killed during a tick are removed at its end.
+    Actors far from a focus point can be moved less often (see `set_lod`).
     """
-    def __init__(self, size: Point):
+    def __init__(self, size: Point, rng: Random = None):
         """Create an arena, with given dimensions in pixels.
+        Actors draw random numbers from `rng` (a new unseeded
+        generator if None), so a seeded one makes games reproducible.
         """
         self._w, self._h = size
+        self._random = rng if rng is not None else Random()
         self._count = 0
         self._turn = -1
-        self._actors = []
+        self._actors = {}  # actor -> spawn order, in spawn order
+        self._killed = {}  # actors to remove at the end of the tick
+        self._roles = {}  # role name -> actor
+        self._ticking = False
         self._curr_keys = self._prev_keys = tuple()
-        self._collisions = []
+        self._action_bits = {}  # action -> bit
+        self._key_actions = {}  # key -> bits of its actions
+        self._input = InputSnapshot((), (), self._action_bits, self._key_actions)
+        self._collisions = {}
+        self._buckets = {}  # (actor, kind) -> collisions of that kind, this tick
+        self._kinds = {}  # kind -> _KindMatch
+        self._current = None
+        self._tile = 40
+        self._last_seq = 0
+        self._dynamic = {}  # moving actors, in spawn order
+        self._dynamic_cells = {}  # tile -> moving actors in that tile
+        self._dynamic_tiles = {}  # moving actor -> tiles it covered when last filed
+        self._dynamic_rects = {}  # moving actor -> its rectangle when last filed
+        self._refiled = True  # no tick or spawn since the last refile
+        self._static_cells = {}  # tile -> static actors in that tile
+        self._static_tiles = {}  # static actor -> tiles it covers
+        self._static_colls = {}  # static actor -> colliding static actors
+        self._profile = None
+        self._lod = {}  # class -> (distance, every)
+        self._lod_rules = {}  # actor type -> rule of its nearest class in _lod, or None
+        self._lod_actors = {}  # actors under a rule, in spawn order
+        self._lod_focus = None
+        self._last_moved = {}  # actor under a rule -> tick of its last move
+        self._skipped = set()  # actors not moved this tick
+        self._lod_elapsed = {}  # actor under a rule moved this tick -> elapsed ticks
+        self._elapsed = 1
 
     def spawn(self, a: Actor):
         """Register an actor into this arena.
         Actors are blitted in their order of registration.
         """
+        if a in self._killed:  # killed and spawned again in the same tick
+            del self._killed[a]
+            self._remove(a)
         if a not in self._actors:
-            self._actors.append(a)
+            self._last_seq += 1
+            self._actors[a] = self._last_seq
+            if a.is_static():
+                self._index_static(a)
+            else:
+                self._dynamic[a] = None
+                self._refiled = False
+            if self._lod and self._lod_rule(type(a)) is not None:
+                self._lod_actors[a] = None
 
     def kill(self, a: Actor):
         """Remove an actor from this arena.
+        During a tick, the actor is removed at the end of the tick:
+        it still collides and moves (if not moved yet) until then.
         """
         if a in self._actors:
-            self._actors.remove(a)
+            if self._ticking:
+                self._killed[a] = None
+            else:
+                self._remove(a)
+
+    def kill_enemy(self, a: Actor) -> bool:
+        """Kill an enemy defeated by the player (see kill).
+        Subclasses can override it, e.g. to count the kills.
+        Return True if it was alive.
+        """
+        alive = self.is_alive(a)
+        self.kill(a)
+        return alive
+
+    def _remove(self, a: Actor):
+        del self._actors[a]
+        self._lod_actors.pop(a, None)
+        self._last_moved.pop(a, None)  # spawned again, it restarts from there
+        if a in self._static_tiles:
+            self._unindex_static(a)
+        else:
+            del self._dynamic[a]
+            self._dynamic_rects.pop(a, None)
+            for t in self._dynamic_tiles.pop(a, ()):
+                self._dynamic_cells[t].remove(a)
+
+    def _remove_killed(self):
+        for a in self._killed:
+            self._remove(a)
+        self._killed.clear()
+
+    def is_alive(self, a: Actor) -> bool:
+        """Return True if the actor is in this arena and was not killed.
+        """
+        return a in self._actors and a not in self._killed
+
+    def set_role(self, name: str, a: Actor | None):
+        """Register actor `a` under a role (e.g. "hero"), replacing
+        the previous one. The actor can be spawned before or after.
+        """
+        if a is None:
+            self._roles.pop(name, None)
+        else:
+            self._roles[name] = a
+
+    def role(self, name: str) -> Actor | None:
+        """Return the actor registered under a role, if it is alive.
+        """
+        a = self._roles.get(name)
+        return a if a is not None and self.is_alive(a) else None
 
     def tick(self, keys=[]):
         """Move all actors (through their own move method).
         """
+        if self._profile is not None:
+            return self._profiled_tick(keys)
         actors = list(reversed(self._actors))
-        self._detect_collisions(actors)
-        self._prev_keys = self._curr_keys
-        self._curr_keys = keys
-        for self._turn, a in enumerate(actors):
-            a.move(self)
+        self._lod_pass()
+        self._detect_collisions()
+        self._read_input(keys)
+        self._ticking = True
+        skipped, elapsed = self._skipped, self._lod_elapsed
+        try:
+            for self._turn, a in enumerate(actors):
+                if a in skipped:
+                    continue
+                self._current = a
+                self._elapsed = elapsed.get(a, 1)
+                a.move(self)
+        finally:
+            self._ticking = False
+            self._refiled = False
+            self._remove_killed()
         self._count += 1
 
-    def _naive_collisions(self, actors):
-        # self._collisions = [[a2 for a2 in actors if a1 is not a2 and check_collision(a1, a2)] for a1 in actors]
+    def _profiled_tick(self, keys):
+        # same as `tick`, but timing each phase
+        profile = self._profile
+        profile.start_tick()
+        actors = list(reversed(self._actors))
+        self._lod_pass()
+        start = perf_counter()
+        self._detect_collisions()
+        profile.add(TickProfile.COLLISIONS, perf_counter() - start)
+        self._read_input(keys)
+        self._ticking = True
+        skipped, elapsed = self._skipped, self._lod_elapsed
+        try:
+            for self._turn, a in enumerate(actors):
+                if a in skipped:
+                    continue
+                self._current = a
+                self._elapsed = elapsed.get(a, 1)
+                start = perf_counter()
+                a.move(self)
+                profile.add(type(a).__name__, perf_counter() - start)
+        finally:
+            self._ticking = False
+            self._refiled = False
+            self._remove_killed()
+        profile.end_tick()
+        self._count += 1
+
+    def set_lod(self, kind: type, distance: float, every: int):
+        """Move the actors of class `kind` (subclasses included) only
+        once every `every` ticks while they are farther than `distance`
+        pixels from the focus (see `set_lod_focus`); nearer, they move
+        at every tick. The rule of the nearest class counts; `every`
+        of 1 removes the rule. Through `elapsed`, an actor knows how
+        many ticks passed since its last move.
+        """
+        if every > 1:
+            self._lod[kind] = distance, every
+        else:
+            self._lod.pop(kind, None)
+        self._lod_rules.clear()
+        self._last_moved.clear()
+        self._lod_actors = {a: None for a in self._actors if self._lod_rule(type(a)) is not None}
+
+    def set_lod_focus(self, pt: Point | None):
+        """Set the point (usually the hero) the distances of the
+        `set_lod` rules are measured from. If None, all actors move
+        at every tick.
+        """
+        self._lod_focus = pt
+
+    def elapsed(self) -> int:
+        """Return the ticks passed since the current actor last moved:
+        1, unless it is far from the focus (see `set_lod`).
+        """
+        return self._elapsed
+
+    def _lod_pass(self):
+        # choose the actors skipping this tick (see `set_lod`), by
+        # their positions at its start, and the elapsed ticks of the
+        # others under a rule
+        self._skipped, self._lod_elapsed = set(), {}
+        focus, count, rules, seqs = self._lod_focus, self._count, self._lod_rules, self._actors
+        for a in self._lod_actors:
+            seq = seqs[a]
+            distance, every = rules[type(a)]
+            # far actors are spread over the ticks by spawn order;
+            # with no focus, all move (and their moves are recorded)
+            if focus is not None and (count + seq) % every:
+                fx, fy = focus
+                x, y = a.pos()
+                w, h = a.size()
+                if x - fx > distance or fx - x - w > distance or y - fy > distance or fy - y - h > distance:
+                    self._skipped.add(a)
+                    continue
+            self._lod_elapsed[a] = count - self._last_moved.get(a, count - 1)
+            self._last_moved[a] = count
+
+    def _lod_rule(self, t: type) -> tuple | None:
+        # the rule of the nearest class of type `t` (see `set_lod`)
+        rules = self._lod_rules
+        if t not in rules:
+            rules[t] = next((self._lod[c] for c in t.__mro__ if c in self._lod), None)
+        return rules[t]
+
+    def enable_profiling(self, dump_at_exit: bool=False, path: str=None) -> TickProfile:
+        """Start recording the cost of each actor class (see `TickProfile`).
+        If `dump_at_exit`, the stats are dumped when the program exits,
+        as JSON to `path` or as a table to stderr.
+        """
+        if self._profile is None:
+            self._profile = TickProfile()
+            if dump_at_exit:
+                atexit.register(self._profile.dump, path)
+        return self._profile
+
+    def disable_profiling(self):
+        """Stop recording. The stats collected so far stay in the
+        profile returned by `enable_profiling`.
+        """
+        self._profile = None
+
+    def profile(self) -> TickProfile | None:
+        """Return the current profile, or None if profiling is disabled.
+        """
+        return self._profile
+
+    def _tiles(self, a: Actor) -> list[int]:
+        """Return the indices of the tiles touched by actor `a`.
+        """
+        return self._rect_tiles(a.pos() + a.size())
+
+    def _rect_tiles(self, rect: tuple) -> list[int]:
+        tile = self._tile
+        nx, ny = int(-(-self._w // tile)), int(-(-self._h // tile))  # ceil div
+        x, y, w, h = (round(v) for v in rect)
+        return [ty * nx + tx
+                for tx in range(max((x - 1) // tile, 0), min(1 + (x + w + 1) // tile, nx))
+                for ty in range(max((y - 1) // tile, 0), min(1 + (y + h + 1) // tile, ny))]
+
+    def _index_static(self, a: Actor):
+        # a static actor with no size (e.g. one that only moves other
+        # actors) is not a body: it is in no tile and touches nothing
+        tiles = self._tiles(a) if a.size() != (0, 0) else []
+        self._static_tiles[a] = tiles
+        neighs = set()
+        for t in tiles:
+            cell = self._static_cells.setdefault(t, [])
+            neighs.update(cell)
+            cell.append(a)
+        colls = [o for o in neighs if check_collision(a, o)]
+        for o in colls:
+            # `a` is the newest actor, so the list stays in spawn order
+            self._static_colls[o] = self._static_colls[o] + [a]
+        self._static_colls[a] = sorted(colls, key=self._actors.__getitem__)
+
+    def _unindex_static(self, a: Actor):
+        for t in self._static_tiles.pop(a):
+            self._static_cells[t].remove(a)
+        for o in self._static_colls.pop(a):
+            # lists are replaced, not mutated, as they may be in use this tick
+            self._static_colls[o] = [c for c in self._static_colls[o] if c is not a]
+
+    def _refile_dynamic(self):
+        # move each moving actor to the tiles it touches now; the cells
+        # are kept from tick to tick, as most actors stay in their tiles
+        cells, tiles, rects = self._dynamic_cells, self._dynamic_tiles, self._dynamic_rects
+        for a in self._dynamic:
+            rect = a.pos() + a.size()
+            if rects.get(a) == rect:
+                continue
+            rects[a] = rect
+            new, old = self._rect_tiles(rect), tiles.get(a, ())
+            if new != old:
+                for t in old:
+                    cells[t].remove(a)
+                for t in new:
+                    cell = cells.get(t)
+                    if cell is None:
+                        cell = cells[t] = []
+                    cell.append(a)
+                tiles[a] = new
+        self._refiled = True
+
+    def _naive_collisions(self):
+        # self._collisions = {a1: [a2 for a2 in actors if a1 is not a2 and check_collision(a1, a2)] for a1 in actors}
         self._collisions.clear()
-        for a1 in actors:
+        self._buckets.clear()
+        # static actors with no size are not bodies (see `_index_static`)
+        bodies = [a for a in self._actors if not (a in self._static_tiles and a.size() == (0, 0))]
+        for a1 in bodies:
             colls1 = []
-            for a2 in actors:
+            for a2 in bodies:
                 if a1 is not a2 and check_collision(a1, a2):
                     colls1.append(a2)
-            self._collisions.append(colls1)
+            self._collisions[a1] = colls1
 
-    def _detect_collisions(self, actors):
+    def _detect_collisions(self):
         self._collisions.clear()
-        # divide the arena in tiles, for efficient collision detection
-        tile = 40
-        nx, ny = -(-self._w // tile),  -(-self._h // tile)  # ceil div
-        cells = [set() for _ in range(nx * ny)]  # each tile is a set
-        for i, a in enumerate(actors):
-            x, y, w, h = (round(v) for v in a.pos() + a.size())
-            for tx in range((x - 1) // tile, 1 + (x + w + 1) // tile):
-                for ty in range((y - 1) // tile, 1 + (y + h + 1) // tile):
-                    if 0 <= tx < nx and 0 <= ty < ny:
-                        # add actor `a` to the tile @ (tx, ty)
-                        cells[ty * nx + tx].add(i)
-        for i, a in enumerate(actors):
+        self._buckets.clear()
+        seq, static = self._actors, self._static_tiles
+        # divide the arena in tiles, for efficient collision detection;
+        # static actors are already in `_static_cells`
+        self._refile_dynamic()
+        cells, tiles = self._dynamic_cells, self._dynamic_tiles
+        hits = {}  # static actor -> moving actors touching it
+        skipped = self._skipped
+        for a in self._dynamic:
+            if a in skipped:
+                # not moving this tick (see `set_lod`): its collisions
+                # are needed only by the static actors that move
+                for o in {o for t in tiles[a] for o in self._static_cells.get(t, ())}:
+                    if o not in skipped and check_collision(a, o):
+                        hits.setdefault(o, []).append(a)
+                continue
             neighs = set()
-            x, y, w, h = (round(v) for v in a.pos() + a.size())
-            for tx in range((x - 1) // tile, 1 + (x + w + 1) // tile):
-                for ty in range((y - 1) // tile, 1 + (y + h + 1) // tile):
-                    if 0 <= tx < nx and 0 <= ty < ny:
-                        # all actors sharing some tile with `a`
-                        neighs |= cells[ty * nx + tx]
-            colls = [actors[j] for j in sorted(neighs, reverse=True)
-                     if i != j and check_collision(a, actors[j])]
-            self._collisions.append(colls)
-
-    def collisions(self) -> list[Actor]:
-        """Get list of actors colliding with current actor
-        """
-        t, colls = self._turn, self._collisions
-        return colls[t] if 0 <= t < len(colls) else []
+            for t in tiles[a]:
+                # all actors sharing some tile with `a`
+                neighs.update(cells[t])
+                neighs.update(self._static_cells.get(t, ()))
+            neighs.discard(a)
+            colls = sorted((o for o in neighs if check_collision(a, o)),
+                           key=seq.__getitem__)
+            self._collisions[a] = colls
+            for o in colls:
+                if o in static:
+                    hits.setdefault(o, []).append(a)
+        for a, movers in hits.items():
+            self._collisions[a] = sorted(self._static_colls[a] + movers,
+                                         key=seq.__getitem__)
+
+    def collisions(self, kind: type | tuple[type, ...]=None) -> list[Actor]:
+        """Get list of actors colliding with current actor.
+        If `kind` is given (a class or a tuple of classes, as in
+        `isinstance`), get only the ones of that kind, in the same order.
+        Each kind is filtered at most once per actor and tick.
+        """
+        a = self._current
+        colls = self._collisions.get(a)
+        if colls is None:
+            colls = self._static_colls.get(a, [])
+        if kind is None or not colls:
+            return colls
+        bucket = self._buckets.get((a, kind))
+        if bucket is None:
+            match = self._kinds.get(kind)
+            if match is None:
+                match = self._kinds[kind] = _KindMatch(kind)
+            bucket = self._buckets[a, kind] = [o for o in colls if match[type(o)]]
+        return bucket
+
+    def actors_in(self, pos: Point, size: Point) -> list[Actor]:
+        """Return the actors touching the rectangle (e.g. the visible
+        part of the arena), in their order of registration.
+        Only the tiles of the rectangle are looked up, in the index of
+        the static actors and in the grid of the moving ones, refiled
+        if a tick or a spawn happened since (an actor moved otherwise
+        is found where it was). During a tick, as in `collisions`,
+        moving actors are found where they were at its start, and
+        the ones spawned in it are not found.
+        """
+        if not self._ticking and not self._refiled:
+            self._refile_dynamic()
+        rect = pos + size
+        found = self._found_in(self._static_cells, rect)
+        found.update(self._found_in(self._dynamic_cells, rect, self._dynamic_rects))
+        return sorted(found, key=self._actors.__getitem__)
+
+    def statics_in(self, pos: Point, size: Point, kind: type | tuple[type, ...]=None) -> list[Actor]:
+        """Return the static actors touching the rectangle (of `kind`,
+        if given, as in `collisions`), in their order of registration.
+        Only the spatial index is looked up: no moving actor is checked.
+        """
+        found = self._statics_in(pos, size)
+        if kind is not None:
+            match = self._kinds.get(kind)
+            if match is None:
+                match = self._kinds[kind] = _KindMatch(kind)
+            found = [a for a in found if match[type(a)]]
+        return sorted(found, key=self._actors.__getitem__)
+
+    def _statics_in(self, pos: Point, size: Point) -> set:
+        return self._found_in(self._static_cells, pos + size)
+
+    def _found_in(self, cells: dict, rect: tuple, rects: dict=None) -> set:
+        # actors in the `cells` of the rectangle, touching it (where
+        # `rects` says, if given, otherwise where they are)
+        found = set()
+        for t in self._rect_tiles(rect):
+            found.update(cells.get(t, ()))
+        if rects is None:
+            return {a for a in found if _touches(a, rect)}
+        return {a for a in found if _rects_touch(rects[a], rect)}
 
     def actors(self) -> list:
         """Return a copy of the list of actors.
         """
+        if self._killed:
+            return [a for a in self._actors if a not in self._killed]
         return list(self._actors)
 
     def size(self) -> Point:
@@ -141,11 +642,53 @@ class Arena():
         """
         return (self._w, self._h)
 
+    def random(self) -> Random:
+        """Return the random number generator of the arena.
+        """
+        return self._random
+
     def count(self) -> int:
         """Return the total count of ticks (or frames).
         """
         return self._count
 
+    def _read_input(self, keys):
+        self._prev_keys = self._curr_keys
+        self._curr_keys = keys
+        self._input = InputSnapshot(keys, self._prev_keys, self._action_bits, self._key_actions)
+
+    def set_actions(self, actions: dict[str, Iterable[str]]):
+        """Map each action (e.g. "Jump") to the keys that trigger it,
+        replacing the previous map (e.g. to remap the keys).
+        Actors then ask for actions, not keys (see `action_down`).
+        """
+        self._action_bits = {name: 1 << i for i, name in enumerate(actions)}
+        self._key_actions = {}
+        for name, keys in actions.items():
+            for k in keys:
+                self._key_actions[k] = self._key_actions.get(k, 0) | self._action_bits[name]
+        self._input = InputSnapshot(self._curr_keys, self._prev_keys, self._action_bits, self._key_actions)
+
+    def input(self) -> InputSnapshot:
+        """Return the input of the current tick.
+        """
+        return self._input
+
+    def action_down(self, action: str) -> bool:
+        """Return True if a key of `action` is pressed (see `set_actions`).
+        """
+        return bool(self._input.mask() & self._action_bits.get(action, 0))
+
+    def action_pressed(self, action: str) -> bool:
+        """Return True if `action` started in this tick.
+        """
+        return self._input.pressed(action)
+
+    def action_released(self, action: str) -> bool:
+        """Return True if `action` ended in this tick.
+        """
+        return self._input.released(action)
+
     def current_keys(self) -> list[str]:
         """Return the currently pressed keys.
         """
@@ -155,3 +698,217 @@ class Arena():
         """Return the keys pressed at last tick.
         """
         return self._prev_keys
+
+
+# TESTING
+import unittest
+
+class _Box(Actor):
+    def __init__(self, pos: Point, size: Point, dx: float = 0, static: bool = False):
+        self._x, self._y = pos
+        self._w, self._h = size
+        self._dx, self._static = dx, static
+
+    def move(self, arena: Arena):
+        self._x += self._dx
+
+    def pos(self) -> Point:
+        return self._x, self._y
+
+    def size(self) -> Point:
+        return self._w, self._h
+
+    def sprite(self) -> Point | None:
+        return None
+
+    def is_static(self) -> bool:
+        return self._static
+
+class ArenaTest(unittest.TestCase):
+    def _arena(self) -> Arena:
+        arena = Arena((500, 200))
+        for x in range(0, 400, 30):
+            arena.spawn(_Box((x, 150), (35, 20), static=True))
+        for x in range(0, 400, 45):
+            arena.spawn(_Box((x, 135), (12, 16), dx=3))
+        arena.spawn(_Box((90, 90), (20, 70), static=True))
+        return arena
+
+    def _all_collisions(self, arena: Arena) -> list[list[Actor]]:
+        result = []
+        for arena._current in arena.actors():
+            result.append(list(arena.collisions()))
+        return result
+
+    def test_static_index_matches_naive(self):
+        arena = self._arena()
+        for _ in range(20):
+            arena.tick()
+            arena._detect_collisions()
+            indexed = self._all_collisions(arena)
+            arena._naive_collisions()
+            self.assertEqual(self._all_collisions(arena), indexed)
+
+    def test_profiling(self):
+        arena = self._arena()
+        boxes = len(arena.actors())
+        profile = arena.enable_profiling()
+        for _ in range(3):
+            arena.tick()
+        stats = profile.stats()
+        self.assertEqual(3, profile.ticks())
+        self.assertEqual(3 * boxes, stats["_Box"]["calls"])
+        self.assertEqual(boxes, stats["_Box"]["last_calls"])
+        self.assertEqual(3, stats[TickProfile.COLLISIONS]["calls"])
+        arena.disable_profiling()
+        arena.tick()
+        self.assertEqual(3, profile.ticks())
+
+    def test_actors_in(self):
+        arena = self._arena()
+        boxes = [a for a in arena.actors() if not a.is_static()]
+        views = [((100, 120), (150, 40)), ((0, 0), (500, 200)), ((30, 140), (0, 0)), ((380, 100), (60, 60))]
+        for i in range(12):
+            arena.tick()
+            if i == 4:
+                arena.kill(boxes[3])
+                arena.spawn(_Box((200, 140), (10, 10), dx=-5))
+            for pos, size in views:
+                view = _Box(pos, size)
+                expected = [a for a in arena.actors() if check_collision(a, view)]
+                self.assertEqual(expected, arena.actors_in(pos, size))
+
+    def test_actors_in_during_tick(self):
+        arena = Arena((200, 200))
+        mover = _Box((0, 50), (10, 10), dx=20)
+        found = []
+        class _Looker(_Box):
+            def move(self, arena: Arena):
+                found.append(arena.actors_in((15, 45), (20, 20)))
+        looker = _Looker((100, 100), (5, 5))
+        arena.spawn(looker)
+        arena.spawn(mover)  # it moves first, but it is found where it was
+        arena.tick()
+        arena.tick()
+        self.assertEqual([[], [mover]], found)
+        self.assertEqual([], arena.actors_in((15, 45), (20, 20)))
+
+    def test_collisions_of_kind(self):
+        class _Wall(_Box): pass
+        arena = Arena((200, 200))
+        box = _Box((50, 50), (20, 20))
+        others = [_Wall((60, 60), (20, 20), static=True), _Box((45, 45), (10, 10)), _Wall((40, 60), (30, 5))]
+        for a in [box] + others:
+            arena.spawn(a)
+        arena.tick()
+        arena._current = box
+        self.assertEqual(others, arena.collisions())
+        self.assertEqual([others[0], others[2]], arena.collisions(_Wall))
+        self.assertIs(arena.collisions(_Wall), arena.collisions(_Wall))
+        self.assertEqual(others, arena.collisions((_Wall, _Box)))
+        self.assertEqual([], arena.collisions(ArenaTest))
+
+    def test_kill_during_tick(self):
+        arena = Arena((200, 200))
+        boxes = [_Box((x, 50), (20, 20)) for x in range(0, 100, 10)]
+        for b in boxes:
+            arena.spawn(b)
+        moved = []
+        class _Killer(_Box):
+            def move(self, arena: Arena):
+                moved.append(self)
+                for b in arena.collisions():
+                    arena.kill(b)
+                self.assertions(arena)
+        killer = _Killer((25, 50), (10, 10))
+        def assertions(arena: Arena):
+            self.assertFalse(arena.is_alive(boxes[2]))
+            self.assertNotIn(boxes[2], arena.actors())
+            self.assertEqual(boxes[1:4], arena.collisions())  # still colliding in this tick
+        killer.assertions = assertions
+        arena.spawn(killer)
+        arena.spawn(boxes[3])  # already there: no change
+        arena.tick()
+        self.assertEqual(boxes[:1] + boxes[4:] + [killer], arena.actors())
+        self.assertEqual([killer], moved)
+        arena.spawn(boxes[3])
+        self.assertIs(boxes[3], arena.actors()[-1])
+
+    def test_roles(self):
+        arena = Arena((100, 100))
+        hero = _Box((10, 10), (5, 5))
+        arena.set_role("hero", hero)
+        self.assertIsNone(arena.role("hero"))
+        arena.spawn(hero)
+        self.assertIs(hero, arena.role("hero"))
+        self.assertIsNone(arena.role("villain"))
+        arena.kill(hero)
+        self.assertIsNone(arena.role("hero"))
+        arena.spawn(hero)
+        arena.set_role("hero", None)
+        self.assertIsNone(arena.role("hero"))
+
+    def test_lod(self):
+        arena = Arena((1000, 100))
+        near, far = _Box((10, 10), (5, 5), dx=1), _Box((800, 10), (5, 5), dx=1)
+        arena.spawn(near)
+        arena.spawn(far)
+        elapsed = []
+        far.move = lambda a: elapsed.append(a.elapsed())
+        arena.set_lod(_Box, 100, 4)
+        arena.set_lod_focus((0, 0))
+        for _ in range(12):
+            arena.tick()
+        self.assertEqual(22, near.pos()[0])  # moved at every tick
+        self.assertEqual([1, 4, 4], elapsed)
+        arena.set_lod(_Box, 100, 1)
+        arena.tick()
+        self.assertEqual([1, 4, 4, 1], elapsed)
+
+    def test_lod_spawned_later(self):
+        arena = Arena((1000, 100))
+        arena.set_lod(_Box, 100, 4)
+        arena.set_lod_focus((0, 0))
+        far = _Box((800, 10), (5, 5), dx=1)
+        arena.spawn(far)
+        for _ in range(8):
+            arena.tick()
+        self.assertEqual(802, far.pos()[0])  # under the rule as soon as spawned
+        arena.kill(far)
+        arena.tick()
+        arena.spawn(far)
+        for _ in range(4):
+            arena.tick()
+        self.assertEqual(803, far.pos()[0])
+
+    def test_actions(self):
+        arena = Arena((100, 100))
+        arena.set_actions({"Jump": {"Spacebar", "w"}, "Fire": {"f"}})
+        arena.tick(["w"])
+        self.assertTrue(arena.action_down("Jump"))
+        self.assertTrue(arena.action_pressed("Jump"))
+        self.assertFalse(arena.action_down("Fire"))
+        self.assertFalse(arena.action_down("Crouch"))  # unknown
+        arena.tick(["w", "Spacebar", "f"])
+        self.assertTrue(arena.action_down("Jump"))
+        self.assertFalse(arena.action_pressed("Jump"))  # held
+        self.assertTrue(arena.action_pressed("Fire"))
+        snapshot = arena.input()
+        arena.tick([])
+        self.assertTrue(arena.action_released("Jump"))
+        self.assertTrue(snapshot.down("Fire"))  # snapshots don't change
+        arena.set_actions({"Jump": {"x"}})  # remapped
+        arena.tick(["w"])
+        self.assertFalse(arena.action_down("Jump"))
+        self.assertTrue(arena.input().key_down("w"))
+
+    def test_kill_static(self):
+        arena = self._arena()
+        wall = arena.actors()[-1]
+        arena.kill(wall)
+        self.assertNotIn(wall, arena._static_tiles)
+        for colls in arena._static_colls.values():
+            self.assertNotIn(wall, colls)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,18 @@
+"""
+Module created by Giovanni Ancora for a project at UniPr.
+@author Giovanni Ancora (https://github.com/GioTFG and https://github.com/GiovanniAncora)
+This project on GitHub: https://github.com/GioTFG/Ghosts-and-Goblins
+
+Chooses the g2d implementation used by the game, so that the rest of the code can simply do:
+from src.framework.backend import g2d
+
+If the GNG_HEADLESS environment variable is set (to anything other than "" or "0") before the game is imported,
+the display-less g2d_headless is used instead of the real g2d.
+"""
+
+import os
+
+if os.environ.get("GNG_HEADLESS", "0") not in ("", "0"):
+    from src.framework import g2d_headless as g2d
+else:
+    from src.framework import g2d
@@ -0,0 +1,189 @@
+"""
+Module created by Giovanni Ancora for a project at UniPr.
+@author Giovanni Ancora (https://github.com/GioTFG and https://github.com/GiovanniAncora)
+This project on GitHub: https://github.com/GioTFG/Ghosts-and-Goblins
+
+Batch runner: plays many independent games (episodes) headless, on all the CPU cores, and collects their results.
+It is used to evaluate a level without a human playing it.
+
+Every episode has its own level config file, seed and input policy.
+A policy is a callable that receives the game and returns the keys to press in the next frame; as episodes run
+in other processes, policies must be picklable (i.e. defined at the top level of a module).
+"""
+
+import os
+import sys
+import time
+from multiprocessing import Pool
+from random import Random
+
+os.environ.setdefault("GNG_HEADLESS", "1") # Episodes are never rendered
+
+from src.framework.gnggame import GngGame
+from src.framework.replay import Recording
+
+from path_util import ROOT_PATH
+
+
+# -- POLICIES --
+class IdlePolicy:
+    """
+    Never presses any key.
+    """
+    def __call__(self, game: GngGame) -> list[str]:
+        return []
+
+class RandomPolicy:
+    """
+    Presses a random combination of keys, changing it every few frames.
+    It has its own generator, so it doesn't change the random events of the game.
+    """
+    def __init__(self, seed: int = None, keys: tuple[str, ...] = ("a", "d", "d", "Spacebar", "f", "w"), hold: int = 10):
+        """
+        :param keys: Keys to choose from. A key appearing more than once is chosen more often.
+        :param hold: Number of frames the same keys stay pressed.
+        """
+        self._random = Random(seed)
+        self._keys = keys
+        self._hold = hold
+        self._current = []
+
+    def __call__(self, game: GngGame) -> list[str]:
+        if game.count() % self._hold == 0:
+            self._current = list(set(self._random.sample(self._keys, self._random.randrange(3))))
+        return self._current
+
+class RunRightPolicy:
+    """
+    Always runs towards the end of the level, jumping and attacking at regular intervals.
+    """
+    def __init__(self, jump_every: int = 25, attack_every: int = 15):
+        self._jump_every = jump_every
+        self._attack_every = attack_every
+
+    def __call__(self, game: GngGame) -> list[str]:
+        keys = ["d"]
+        if game.count() % self._jump_every == 0:
+            keys.append("Spacebar")
+        if game.count() % self._attack_every == 0:
+            keys.append("f")
+        return keys
+
+class ReplayPolicy:
+    """
+    Presses the keys of a recording (see the replay module), then nothing.
+    """
+    def __init__(self, recording_path: str):
+        self._path = recording_path
+        self._frames = None
+
+    def __call__(self, game: GngGame) -> list[str]:
+        if self._frames is None: # The recording is loaded in the worker process
+            self._frames = Recording.load(self._path).frames()
+        return next(self._frames, [])
+
+
+# -- EPISODES --
+class Episode:
+    """
+    Everything needed to play a game: level, seed, input policy and the maximum number of frames.
+    """
+    def __init__(self, config_path: str, seed: int, policy = None, max_frames: int = 30 * 60 * 5):
+        self.config_path = config_path
+        self.seed = seed
+        self.policy = policy if policy is not None else IdlePolicy()
+        self.max_frames = max_frames
+
+def run_episode(episode: Episode) -> dict:
+    """
+    Plays an episode until the game is won or over, or until the frame cap.
+    :return: A row of the results table (see COLUMNS).
+    """
+    game = GngGame(file_path=episode.config_path, seed=episode.seed)
+    policy = episode.policy
+
+    start = time.perf_counter()
+    while game.count() < episode.max_frames and not game.game_won() and not game.game_over():
+        game.tick(policy(game))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "config": os.path.basename(episode.config_path),
+        "seed": episode.seed,
+        "policy": type(policy).__name__,
+        "frames": game.count(),
+        "lives_used": game.get_max_lives() - game.get_lives() + game.game_over(),
+        "enemies_killed": game.get_enemies_killed(),
+        "result": "won" if game.game_won() else "lost" if game.game_over() else "cap",
+        "ticks_per_s": game.count() / elapsed if elapsed > 0 else 0.0,
+    }
+
+def run_batch(episodes: list[Episode], processes: int = None) -> list[dict]:
+    """
+    Plays all the episodes on a pool of processes (by default, one per CPU core).
+    :return: The results, one row per episode, in the same order as the episodes.
+    """
+    with Pool(processes) as pool:
+        return pool.map(run_episode, episodes, chunksize=1)
+
+
+# -- RESULTS --
+COLUMNS = ("config", "seed", "policy", "frames", "lives_used", "enemies_killed", "result", "ticks_per_s")
+NUMERIC_COLUMNS = ("frames", "lives_used", "enemies_killed", "ticks_per_s")
+
+def summary(results: list[dict]) -> dict:
+    """
+    Aggregates the results: mean of every numeric column, and how many games ended in each way.
+    """
+    n = max(len(results), 1)
+    row = {c: sum(r[c] for r in results) / n for c in NUMERIC_COLUMNS}
+    row["config"] = f"mean of {len(results)}"
+    row["seed"] = row["policy"] = ""
+    row["result"] = " ".join(f"{k}:{sum(r['result'] == k for r in results)}" for k in ("won", "lost", "cap"))
+    return row
+
+def format_table(results: list[dict]) -> str:
+    """
+    Formats the results as a plain text table, with the summary as its last row.
+    """
+    def cell(v):
+        return f"{v:.1f}" if isinstance(v, float) else str(v)
+
+    rows = [COLUMNS] + [tuple(cell(r[c]) for c in COLUMNS) for r in results + [summary(results)]]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(COLUMNS))]
+    lines = [" | ".join(v.rjust(w) for v, w in zip(row, widths)) for row in rows]
+    lines.insert(1, "-+-".join("-" * w for w in widths))
+    lines.insert(-1, lines[1])
+    return "\n".join(lines)
+
+
+# TESTING
+import unittest
+
+class BatchTest(unittest.TestCase):
+    def test_frame_cap(self):
+        config = os.path.join(ROOT_PATH, "configs", "level1.txt")
+        result = run_episode(Episode(config, 1, IdlePolicy(), max_frames=50))
+        self.assertEqual(50, result["frames"])
+        self.assertEqual("cap", result["result"])
+
+    def test_deterministic(self):
+        config = os.path.join(ROOT_PATH, "configs", "level1.txt")
+        a = run_episode(Episode(config, 3, RandomPolicy(3), max_frames=600))
+        b = run_episode(Episode(config, 3, RandomPolicy(3), max_frames=600))
+        self.assertEqual({**a, "ticks_per_s": 0}, {**b, "ticks_per_s": 0})
+
+
+if __name__ == "__main__":
+    # Usage: python -m src.framework.batch [episodes] [processes] [config]
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    config = sys.argv[3] if len(sys.argv) > 3 else os.path.join(ROOT_PATH, "configs", "level1.txt")
+
+    # Half of the episodes are played by a random player, the other half by one that always runs right.
+    episodes = [Episode(config, seed, RandomPolicy(seed) if seed % 2 == 0 else RunRightPolicy()) for seed in range(n)]
+
+    start = time.perf_counter()
+    results = run_batch(episodes, processes)
+    print(format_table(results))
+    print(f"{n} episodes in {time.perf_counter() - start:.1f} s")
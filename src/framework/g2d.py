@@ -4,6 +4,8 @@
 @license This software is free - https://opensource.org/license/mit
 """
 
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import Tk, messagebox, simpledialog
 from urllib.request import urlopen
 import io, math, subprocess, sys
@@ -23,24 +25,57 @@ _ws, _hs = _tkmain.winfo_screenwidth(), _tkmain.winfo_screenheight()
 _tkmain.geometry(f"+{_ws // 2}+{_hs // 2}")
 
 _canvas, _display, _tick = None, None, None
-_size, _stroke = (640, 480), 0
+_size, _scale, _scale_mode, _stroke = (640, 480), 1, "copy", 0
+_dirty_mode, _dirty, _all_dirty = False, [], True  # regions drawn since last update
 _color, _background = (127, 127, 127), (255, 255, 255)
 _mouse_pos, _mouse_down = (0, 0), 0
 _curr_keys, _prev_keys = set(), set()
 _loaded = {}
+_sprites = {}  # (src, clip_pos, clip_size) -> pre-cut subsurface
+_pending = {}  # src -> future of an asset decoded in background
+_requested, _pool = set(), None  # assets passed to load_assets
+_audio_exts = (".mp3", ".ogg", ".wav")
+_placeholder = (96, 96, 96)
+_font_name, _fonts = None, {}  # (name, size) -> font
+_texts = OrderedDict()  # (text, size, color) -> rendered text, LRU first
+_max_texts = 256
 
 def _tup(t: tuple, vmin=-math.inf, vmax=math.inf) -> tuple:
     return tuple(min(max(round(v), vmin), vmax) for v in t)
 
-def init_canvas(size: Point, scale=1):
-    """Set size of first CANVAS and return it"""
-    global _canvas, _display, _draw, _size
+def init_canvas(size: Point, scale=1, dirty_rects=False, scale_mode="copy"):
+    """Set size of first CANVAS and return it.
+    With `dirty_rects`, update_canvas only presents the regions
+    touched by draw calls since the previous update.
+    When `scale` != 1, `scale_mode` tells how the canvas is scaled:
+    "copy" into a new surface at each update, "into" straight into
+    the display (no allocations), "sdl" by SDL itself (SCALED
+    flag: the integer factor depends on the desktop size)."""
+    global _canvas, _display, _draw, _size, _scale, _scale_mode, _dirty_mode
+    if scale_mode not in ("copy", "into", "sdl"):
+        raise ValueError(f"Unknown scale mode: {scale_mode}")
     pg.init()
-    _size = _tup(size)
+    _size, _scale, _dirty_mode = _tup(size), scale, dirty_rects
+    _scale_mode = scale_mode if scale != 1 else "copy"
     w, h = _size
-    _display = pg.display.set_mode((w * scale, h * scale))
-    _canvas = pg.Surface(_size, pg.SRCALPHA) if scale != 1 else _display
+    if _scale_mode == "sdl":
+        _display = pg.display.set_mode(_size, pg.SCALED)
+        _canvas = _display
+    else:
+        _display = pg.display.set_mode((w * scale, h * scale))
+        if scale == 1:
+            _canvas = _display
+        elif _scale_mode == "into":
+            # same format as the display, to be scaled straight into it
+            _canvas = pg.Surface(_size, 0, _display)
+        else:
+            _canvas = pg.Surface(_size, pg.SRCALPHA)
     _draw = pg.Surface(_size, pg.SRCALPHA)
+    # images loaded before the display existed get its pixel format now
+    for src, data in _loaded.items():
+        if isinstance(data, pg.Surface):
+            _loaded[src] = data.convert_alpha()
+    _sprites.clear()
     clear_canvas()
 
 def canvas_size() -> Point:
@@ -52,18 +87,54 @@ def set_color(color: Color, width: float=0) -> None:
     _stroke = int(width)
 
 def clear_canvas(background: Color=None) -> None:
-    global _background
+    global _background, _all_dirty
     if background:
         _background = background
     _canvas.fill(_background)
+    _all_dirty = True
+
+def _mark_dirty(rect: pg.Rect) -> None:
+    if _dirty_mode and not _all_dirty:
+        for r in _dirty:
+            if r.contains(rect):
+                return
+        _dirty.append(rect)
+
+def _present_dirty() -> None:
+    rects, bounds = [], _canvas.get_rect()
+    for r in _dirty:
+        r = r.clip(bounds)
+        if r.w and r.h:
+            if _canvas is not _display:
+                s = _scale
+                dest = pg.Rect(r.x * s, r.y * s, r.w * s, r.h * s)
+                if _scale_mode == "into":
+                    pg.transform.scale(_canvas.subsurface(r), dest.size, _display.subsurface(dest))
+                else:
+                    _display.blit(pg.transform.scale(_canvas.subsurface(r), dest.size), dest)
+                r = dest
+            rects.append(r)
+    if rects:
+        pg.display.update(rects)
 
 def update_canvas() -> None:
     global _prev_keys
     _prev_keys = set(_curr_keys)
-    if _canvas is not _display:
-        scaled = pg.transform.scale(_canvas, _display.get_size())
-        _display.blit(scaled, (0, 0))
-    pg.display.update()
+    _present()
+
+def _present() -> None:
+    global _all_dirty
+    if _dirty_mode and not _all_dirty:
+        _present_dirty()
+    else:
+        if _canvas is not _display and _scale_mode == "into":
+            pg.transform.scale(_canvas, _display.get_size(), _display)
+        elif _canvas is not _display:
+            scaled = pg.transform.scale(_canvas, _display.get_size())
+            _display.blit(scaled, (0, 0))
+        pg.display.update()
+    _dirty.clear()
+    _all_dirty = False
     pg.time.wait(0)
 
 def drawing_surface() -> pg.Surface:
@@ -78,68 +149,131 @@ def blit_drawing_surface():
 
 def draw_line(pt1: Point, pt2: Point, width: float=1) -> None:
     surf = drawing_surface()
-    pg.draw.line(surf, _color, _tup(pt1), _tup(pt2), width=max(int(width), _stroke, 1))
+    _mark_dirty(pg.draw.line(surf, _color, _tup(pt1), _tup(pt2), width=max(int(width), _stroke, 1)))
     blit_drawing_surface()
 
 def draw_circle(center: Point, radius: float) -> None:
     surf = drawing_surface()
-    pg.draw.circle(surf, _color, _tup(center), int(radius), width=_stroke)
+    _mark_dirty(pg.draw.circle(surf, _color, _tup(center), int(radius), width=_stroke))
     blit_drawing_surface()
 
 def draw_rect(pos: Point, size: Point) -> None:
     surf = drawing_surface()
     rect = pg.Rect(*_tup(pos + size))
     rect.normalize()
-    pg.draw.rect(surf, _color, rect, width=_stroke)
+    _mark_dirty(pg.draw.rect(surf, _color, rect, width=_stroke))
     blit_drawing_surface()
 
+def _font(size: int) -> pg.font.Font:
+    global _font_name
+    if _font_name is None:  # fonts are enumerated only once
+        fname = "segoeuisymbol"
+        _font_name = fname if fname in pg.font.get_fonts() else "freesansbold"
+    key = _font_name, size
+    if key not in _fonts:
+        _fonts[key] = pg.font.SysFont(_font_name, size)
+    return _fonts[key]
+
 def draw_text(text: str, center: Point, size: int) -> None:
-    fname, fonts = "segoeuisymbol", pg.font.get_fonts()
-    fname = fname if fname in fonts else "freesansbold"
-    font = pg.font.SysFont(fname, int(size))
-    surface = font.render(text, True, _color)
-    if len(_color) > 3 and _color[3] != 255:
-        surface.set_alpha(_color[3])
+    key = text, int(size), _color
+    surface = _texts.get(key)
+    if surface is None:
+        surface = _font(int(size)).render(text, True, _color)
+        if len(_color) > 3 and _color[3] != 255:
+            surface.set_alpha(_color[3])
+        _texts[key] = surface
+        if len(_texts) > _max_texts:
+            _texts.popitem(last=False)  # evict the least recently used
+    else:
+        _texts.move_to_end(key)
     (x, y), (w, h) = _tup(center), surface.get_size()
-    _canvas.blit(surface, (x - w//2, y - h//2))
+    _mark_dirty(_canvas.blit(surface, (x - w//2, y - h//2)))
 
 def draw_polygon(points: list[Point]) -> None:
     surf = drawing_surface()
-    pg.draw.polygon(surf, _color, [_tup(p) for p in points], width=_stroke)
+    _mark_dirty(pg.draw.polygon(surf, _color, [_tup(p) for p in points], width=_stroke))
     blit_drawing_surface()
 
-def load_image(src: str) -> str:
+def _read_image(src: str) -> pg.Surface:
     gh = "https://fondinfo.github.io/sprites/"
+    try:
+        return pg.image.load(src)
+    except:
+        url = src if src.startswith("http") else gh + src
+        return pg.image.load(io.BytesIO(urlopen(url).read()))
+
+def _read_audio(src: str) -> pg.mixer.Sound:
+    try:
+        return pg.mixer.Sound(src)
+    except:
+        return pg.mixer.Sound(io.BytesIO(urlopen(src).read()))
+
+def _loading(src: str) -> bool:
+    return src in _pending and not _pending[src].done()
+
+def load_assets(srcs: list[str], workers: int=4) -> None:
+    """Start decoding images and audio files on a pool of threads.
+    Until an image is ready, draw_image fills its area with a flat
+    placeholder and play_audio plays nothing; load_image and
+    load_audio wait for it. See load_progress."""
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(workers, thread_name_prefix="g2d-assets")
+    for src in srcs:
+        if src not in _loaded and src not in _pending:
+            read = _read_audio if src.lower().endswith(_audio_exts) else _read_image
+            _pending[src] = _pool.submit(read, src)
+        _requested.add(src)
+
+def load_progress() -> float:
+    """Fraction of the assets passed to load_assets that are ready."""
+    if not _requested:
+        return 1.0
+    return sum(not _loading(src) for src in _requested) / len(_requested)
+
+def load_image(src: str) -> str:
     if src not in _loaded:
-        try:
-            _loaded[src] = pg.image.load(src)
-        except:
-            url = src if src.startswith("http") else gh + src
-            image = io.BytesIO(urlopen(url).read())
-            _loaded[src] = pg.image.load(image)
+        future = _pending.pop(src, None)
+        image = future.result() if future else _read_image(src)
+        # same pixel format as the display, so blits need no conversion
+        _loaded[src] = image.convert_alpha() if _display else image
     return src
 
+def _cut_image(src: str, clip_pos: Point, clip_size: Point) -> pg.Surface:
+    image = _loaded[load_image(src)]
+    if clip_pos and clip_size:
+        area = pg.Rect(_tup(clip_pos) + _tup(clip_size))
+        return image.subsurface(area.clip(image.get_rect()))
+    return image
+
 def draw_image(src: str, pos: Point,
                clip_pos: Point=None, clip_size: Point=None) -> None:
-    area = None
-    if clip_pos and clip_size:
-        area=_tup(clip_pos) + _tup(clip_size)
-    _canvas.blit(_loaded[load_image(src)], _tup(pos), area=area)
+    key = src, clip_pos, clip_size
+    try:
+        sprite = _sprites[key]
+    except KeyError:
+        if _loading(src):
+            if clip_size:
+                _mark_dirty(_canvas.fill(_placeholder, _tup(pos) + _tup(clip_size)))
+            return
+        sprite = _sprites[key] = _cut_image(src, clip_pos, clip_size)
+    except TypeError:  # unhashable clip (e.g. lists), not cached
+        sprite = _cut_image(src, clip_pos, clip_size)
+    _mark_dirty(_canvas.blit(sprite, _tup(pos)))
 
 def load_audio(src: str) -> str:
     if src not in _loaded:
-        try:
-            _loaded[src] = pg.mixer.Sound(src)
-        except:
-            audio = io.BytesIO(urlopen(src).read())
-            _loaded[src] = pg.mixer.Sound(audio)
+        future = _pending.pop(src, None)
+        _loaded[src] = future.result() if future else _read_audio(src)
     return src
 
 def play_audio(src: str, loop=False) -> None:
-    _loaded[load_audio(src)].play(-1 if loop else 0)
+    if not _loading(src):
+        _loaded[load_audio(src)].play(-1 if loop else 0)
 
 def pause_audio(src: str) -> None:
-    _loaded[load_audio(src)].stop()
+    if not _loading(src):
+        _loaded[load_audio(src)].stop()
 
 def alert(message: str) -> None:
     if _canvas:
@@ -191,17 +325,25 @@ def key_pressed(key: str) -> bool:
 def key_released(key: str) -> bool:
     return key in _prev_keys and key not in _curr_keys
 
-def main_loop(tick=None, fps: int=30) -> None:
-    global _mouse_pos, _tick
+def main_loop(tick=None, fps: int=30, update=None, max_updates: int=5) -> None:
+    """Call `tick` once per frame, at most `fps` frames per second.
+    With `update`, the game runs on a fixed timestep: `update` is
+    called once for every 1/fps seconds of real time, so several
+    times in a frame that came late (at most `max_updates`, the rest
+    of the delay is dropped), and `tick` only draws the frame."""
+    global _mouse_pos, _tick, _all_dirty, _prev_keys
     _tick = tick
     clock = pg.time.Clock()
     update_canvas()
+    step, lag, last = 1000 / fps, 0.0, pg.time.get_ticks()
     running = True
     while running:
         for e in pg.event.get():
             if e.type == pg.QUIT:
                 running = False
                 break
+            elif e.type in (pg.VIDEOEXPOSE, pg.WINDOWEXPOSED):
+                _all_dirty = True  # the window must be presented again
             elif e.type == pg.KEYDOWN:
                 _curr_keys.add(_kb_name(e.key))
             elif e.type == pg.KEYUP:
@@ -210,13 +352,29 @@ def main_loop(tick=None, fps: int=30) -> None:
                 _curr_keys.add(_mb_name(e.button))
             elif e.type == pg.MOUSEBUTTONUP:
                 _curr_keys.discard(_mb_name(e.button))
-        if _tick:
-            _mouse_pos = pg.mouse.get_pos()
+        _mouse_pos = pg.mouse.get_pos()
+        if update:
+            now = pg.time.get_ticks()
+            lag, last = lag + now - last, now
+            updates = 0
+            while lag >= step and updates < max_updates:
+                update()
+                _prev_keys = set(_curr_keys)  # key edges are seen by one update only
+                lag -= step
+                updates += 1
+            if lag >= step:
+                lag %= step  # too late to catch up: the game slows down instead
+            if _tick:
+                _tick()
+            _present()
+        elif _tick:
             _tick()
             update_canvas()
         clock.tick(fps)
     close_canvas()
 
 def close_canvas() -> None:
+    if _pool:
+        _pool.shutdown(wait=False, cancel_futures=True)
     pg.quit()
     sys.exit()
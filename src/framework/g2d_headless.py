@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Module created by Giovanni Ancora for a project at UniPr.
+@author Giovanni Ancora (https://github.com/GioTFG and https://github.com/GiovanniAncora)
+This project on GitHub: https://github.com/GioTFG/Ghosts-and-Goblins
+
+A display-less replacement for g2d, with the same API.
+It never creates a Tk root nor a pygame window and draws nothing, so the game can be simulated on machines without a
+display, as fast as the CPU allows.
+Keys are not read from any device: a driver sets them for each frame with set_keys.
+"""
+
+import math
+
+Point = tuple[float, float]
+Color = tuple[float, float, float]
+
+_size = (640, 480)
+_color, _background = (127, 127, 127), (255, 255, 255)
+_mouse_pos = (0, 0)
+_curr_keys, _prev_keys = set(), set()
+_loaded = set()
+_running = False
+
+def _tup(t: tuple, vmin=-math.inf, vmax=math.inf) -> tuple:
+    return tuple(min(max(round(v), vmin), vmax) for v in t)
+
+def init_canvas(size: Point, scale=1, dirty_rects=False, scale_mode="copy"):
+    global _size
+    _size = _tup(size)
+
+def canvas_size() -> Point:
+    return _size
+
+def set_color(color: Color, width: float=0) -> None:
+    global _color
+    _color = _tup((list(color) + [255])[:4], 0, 255)
+
+def clear_canvas(background: Color=None) -> None:
+    global _background
+    if background:
+        _background = background
+
+def update_canvas() -> None:
+    global _prev_keys
+    _prev_keys = set(_curr_keys)
+
+def draw_line(pt1: Point, pt2: Point, width: float=1) -> None:
+    pass
+
+def draw_circle(center: Point, radius: float) -> None:
+    pass
+
+def draw_rect(pos: Point, size: Point) -> None:
+    pass
+
+def draw_text(text: str, center: Point, size: int) -> None:
+    pass
+
+def draw_polygon(points: list[Point]) -> None:
+    pass
+
+def load_assets(srcs: list[str], workers: int=4) -> None:
+    """
+    Nothing is decoded, so the assets are ready at once.
+    """
+    _loaded.update(srcs)
+
+def load_progress() -> float:
+    return 1.0
+
+def load_image(src: str) -> str:
+    _loaded.add(src)
+    return src
+
+def draw_image(src: str, pos: Point,
+               clip_pos: Point=None, clip_size: Point=None) -> None:
+    pass
+
+def load_audio(src: str) -> str:
+    _loaded.add(src)
+    return src
+
+def play_audio(src: str, loop=False) -> None:
+    pass
+
+def pause_audio(src: str) -> None:
+    pass
+
+def alert(message: str) -> None:
+    print(message)
+
+def confirm(message: str) -> bool:
+    return False
+
+def prompt(message: str) -> str:
+    return ""
+
+def mouse_pos() -> Point:
+    return _mouse_pos
+
+def set_keys(keys) -> None:
+    """
+    Sets the keys that are pressed from now on (until the next call).
+    It replaces the keyboard and mouse events of the real g2d.
+    """
+    _curr_keys.clear()
+    _curr_keys.update(keys)
+
+def current_keys() -> list[str]:
+    return list(_curr_keys)
+
+def previous_keys() -> list[str]:
+    return list(_prev_keys)
+
+def mouse_clicked() -> bool:
+    return key_released("LeftButton")
+
+def mouse_right_clicked() -> bool:
+    return key_released("RightButton")
+
+def key_pressed(key: str) -> bool:
+    return key in _curr_keys and key not in _prev_keys
+
+def key_released(key: str) -> bool:
+    return key in _prev_keys and key not in _curr_keys
+
+def main_loop(tick=None, fps: int=30, frames: int=None, update=None, max_updates: int=5) -> None:
+    """
+    Calls tick without ever waiting, so fps is ignored.
+    With update (see g2d.main_loop), no frame is ever late: each frame calls update once, then tick, so max_updates
+    is ignored too.
+    The loop ends when close_canvas is called or, if given, after the number of frames.
+    """
+    global _running
+    _running = True
+    update_canvas()
+    count = 0
+    while _running and (frames is None or count < frames):
+        if update:
+            update()
+        if tick:
+            tick()
+        if update or tick:
+            update_canvas()
+        count += 1
+    _running = False
+
+def close_canvas() -> None:
+    global _running
+    _running = False
+
+# TESTING
+import unittest
+
+class HeadlessTest(unittest.TestCase):
+    def test_main_loop_frames(self):
+        ticks = []
+        main_loop(lambda: ticks.append(current_keys()), frames=3)
+        self.assertEqual(3, len(ticks))
+
+    def test_main_loop_update(self):
+        def update():
+            set_keys(["d"])
+            calls.append(key_pressed("d"))
+
+        calls = []
+        set_keys([])
+        main_loop(lambda: calls.append("tick"), update=update, frames=2)
+        self.assertEqual([True, "tick", False, "tick"], calls)
+
+    def test_key_edges(self):
+        set_keys(["Spacebar"])
+        update_canvas()
+        set_keys(["Spacebar", "d"])
+        self.assertTrue(key_pressed("d"))
+        self.assertFalse(key_pressed("Spacebar"))
+        set_keys([])
+        self.assertTrue(key_released("Spacebar"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,21 +4,47 @@ Module created by Giovanni Ancora for a project at UniPr.
 This project on GitHub: https://github.com/GioTFG/Ghosts-and-Goblins
 """
 
+import atexit
 import os.path
-from random import randrange, choice
-import src.framework.g2d as g2d
+from random import Random, randrange
+from src.framework.backend import g2d
 
 from src.actors.arthur import Arthur
 
-from src.actors.enemies import Plant, Zombie, Magician
+from src.actors.enemies import Plant, Zombie, Magician, HERO_ROLE
+from src.actors.projectiles import PROJECTILES_ROLE, kill_actor
 from src.actors.platforms import Ground, BackgroundPlatform, BackgroundLadder, Grave, BackgroundWinArea
-from src.framework.actor import Arena, Point
+from src.framework.actor import Actor, Arena, Point
+from src.framework.level import load_level
 from src.framework.gui import View, TextElement, GuiElement, LifeCounter
+from src.framework.pipeline import Snapshot, DoubleBuffer, SimulationThread
+from src.framework.replay import Recording
 from src.framework.utilities import remove_pos
 
 from path_util import ROOT_PATH
 
 VIEW_W, VIEW_H = 420, 240
+SPRITESHEET = os.path.join(ROOT_PATH, "img", "ghosts-goblins.png")
+BG_CHUNK_W = VIEW_W # Width of the background slices: as wide as the view, so at most two are visible at once
+LEVEL_CHUNK_W = VIEW_W # Width of the chunks the level actors are streamed by (see GngGame)
+STREAM_MARGIN = 2 * VIEW_W # Default distance from Arthur within which the chunks are resident: wider than the plants' range
+
+# Default update rates of the actors far from Arthur (see Arena.set_lod), class: (distance in pixels, moved every N ticks).
+# Plants only shoot within 400 pixels, and graves are hit by weapons thrown by Arthur, so farther than that they are idle.
+# Zombies out of the view only walk and fall: when they are moved, they play all the ticks elapsed since their last move.
+LOD_RULES = {
+    Plant: (500, 10),
+    Grave: (500, 10),
+    Zombie: (VIEW_W, 4),
+}
+
+PLATFORM_CLASSES = {
+    "Ground": Ground,
+    "BackgroundPlatform": BackgroundPlatform,
+    "BackgroundLadder": BackgroundLadder,
+    "Grave": Grave,
+    "BackgroundWinArea": BackgroundWinArea,
+}
 
 
 class GngGame(Arena):
@@ -28,12 +54,32 @@ class GngGame(Arena):
     It manages the initial configuration of the game, allowing it to be done from a file or directly from the code.
     It also manages all the UI elements (even if the actual single elements are generically defined in their own class).
     """
-    def __init__(self, size: Point = None, hero_start_pos: Point = None, file_path: str = None):
+    def __init__(self, size: Point = None, hero_start_pos: Point = None, file_path: str = None, seed: int = None,
+                 stream_margin: int | None = STREAM_MARGIN, lod_rules: dict[type, tuple[int, int]] | None = LOD_RULES,
+                 actions: dict[str, set[str]] = None):
         """
         The parameters must be passed in one of the ways.
         It is better to initialize the game from a file, as it is more dynamic and allows the configuration of static enemies.
+        Everything random in the game comes from a generator initialized with seed, so two games with the same seed,
+        level and keys are identical. If it is None, a random seed is chosen (and can be read with get_seed).
+
+        The level actors (static enemies and platforms) are split in chunks LEVEL_CHUNK_W pixels wide, and only the
+        chunks within stream_margin pixels of Arthur are resident in the arena: the others are loaded when he gets close,
+        and unloaded (removed from the arena, keeping their state) when he goes away.
+        So the actors that tick and collide are about the same however long the level is.
+        If stream_margin is None, the whole level is always resident.
+
+        lod_rules tells how often the actors far from Arthur are moved (see LOD_RULES and Arena.set_lod):
+        if it is None, every actor is moved at every tick.
+
+        actions maps Arthur's actions to the keys that trigger them (see Arena.set_actions): Arthur.ACTIONS if None.
+        Keys can be remapped by passing a different map.
         """
 
+        # Randomness
+        self._seed = seed if seed is not None else randrange(2 ** 32)
+        self._random = Random(self._seed)
+
         # Gameplay attributes
         self._hero_start_pos = hero_start_pos
         self._size = size
@@ -43,6 +89,15 @@ class GngGame(Arena):
         self._current_lives = self._max_lives = 2
 
         self._zombie_spawn_rate = 500
+        self._enemies_killed = 0
+
+        # Level streaming
+        self._stream_margin = stream_margin
+        self._level_order = {} # Level actor -> position in the level, the order in which they are spawned
+        self._chunks = {} # Chunk -> level actors touching it (as dict keys, in the order they were filed)
+        self._filed = {} # Level actor -> first and last chunk it is filed under
+        self._unloaded = set() # Level actors that are out of the arena because their chunks are not resident
+        self._window = None # First and last resident chunk
 
         # File input
         if file_path:
@@ -54,13 +109,23 @@ class GngGame(Arena):
             raise ValueError("Hero starting position must be specified either through the arguments or a file.")
 
         # Arena initialization
-        super().__init__(self._size)
+        super().__init__(self._size, self._random)
+
+        # Profiling: if GNG_PROFILE is set, the cost of each actor class is printed at exit (or saved as JSON in the file it names)
+        if (profile := os.environ.get("GNG_PROFILE", "")) not in ("", "0"):
+            self.enable_profiling(True, None if profile == "1" else profile)
+
+        self.set_actions(actions if actions is not None else Arthur.ACTIONS)
+
+        for kind, (distance, every) in (lod_rules or {}).items():
+            self.set_lod(kind, distance, every)
 
         self._spawn_static_actors()
 
         # Arthur
         self._hero = Arthur(self._hero_start_pos)
         self.spawn(self._hero)
+        self.set_role(HERO_ROLE, self._hero)
 
         # Game
         self._game_over = False
@@ -69,26 +134,33 @@ class GngGame(Arena):
 
     # -- GAME ENGINE METHODS --
     def tick(self, keys=[]):
+        if self._hero is not None:
+            self._stream(self._hero.pos()[0])
+            self.set_lod_focus(self._hero.pos())
+        else:
+            self.set_lod_focus(None)
+
         super().tick(keys)
 
         # Checks done when the game is still running and hasn't finished
         if not self._game_over and not self._game_won:
 
             # Dynamic zombie spawning:
-            if randrange(500) == 0:
+            rng = self.random()
+            if rng.randrange(500) == 0:
                 player_x, player_y = self._hero.pos()
-                direction = choice(("Right", "Left"))
+                direction = rng.choice(("Right", "Left"))
                 if direction == "Right":
-                    self.spawn(Zombie((player_x - randrange(50, 200), player_y), direction))
+                    self.spawn(Zombie((player_x - rng.randrange(50, 200), player_y), direction, rng))
                 else:
-                    self.spawn(Zombie((player_x + randrange(50, 200), player_y), direction))
+                    self.spawn(Zombie((player_x + rng.randrange(50, 200), player_y), direction, rng))
 
             # Check if Arthur reached a Winning Area
             if self._hero.has_won():
                 self._game_won = True
 
             # Check if Arthur died
-            if self._hero not in self.actors():
+            if not self.is_alive(self._hero):
                 if self._current_lives > 0:
                     self.reset_game()
                 else:
@@ -110,6 +182,17 @@ class GngGame(Arena):
         self._current_lives -= 1
         self._hero = Arthur(self._hero_start_pos)
         self.spawn(self._hero)
+        self.set_role(HERO_ROLE, self._hero)
+
+    def kill_enemy(self, enemy: Actor) -> bool:
+        """
+        Called by weapons instead of kill, so that enemies killed by Arthur (and not simply despawned) are counted.
+        Enemy projectiles (e.g. eyeballs) are killed in their batch (see kill_actor) and counted too.
+        """
+        if not kill_actor(self, enemy): # Already killed enemies (e.g. hit by two flames) are not counted twice
+            return False
+        self._enemies_killed += 1
+        return True
 
     # -- GETTER METHODS --
     def get_hero(self):
@@ -122,6 +205,17 @@ class GngGame(Arena):
         return self._current_lives
     def get_max_lives(self):
         return self._max_lives
+    def get_seed(self):
+        return self._seed
+    def get_enemies_killed(self):
+        return self._enemies_killed
+    def get_resident_chunks(self) -> range:
+        """
+        Returns the chunks whose actors are in the arena (all of them, if the level is not streamed).
+        """
+        if self._window is None:
+            return range(min(self._chunks, default=0), max(self._chunks, default=-1) + 1)
+        return range(self._window[0], self._window[1] + 1)
 
     # -- UTILITY METHODS --
     def _kill_all(self):
@@ -129,72 +223,125 @@ class GngGame(Arena):
             self.kill(a)
 
     def _spawn_static_actors(self):
-        for a in self._static_enemies + self._platforms:
+        level_actors = self._static_enemies + self._platforms
+        self._level_order = {a: i for i, a in enumerate(level_actors)}
+        self._moving = [a for a in level_actors if not a.is_static()] # Filed again at every tick (see _stream)
+        self._chunks = {}
+        self._filed = {}
+        for a in level_actors:
+            self._file(a)
+
+        if self._stream_margin is None:
+            self._unloaded = set()
+            self._window = None
+            for a in level_actors:
+                self.spawn(a)
+        else:
+            # Everything starts unloaded, then the chunks around the starting position are loaded
+            self._unloaded = set(level_actors)
+            self._window = None
+            self._stream(self._hero_start_pos[0])
+
+    def _chunk_span(self, a: Actor) -> tuple[int, int]:
+        x, w = a.pos()[0], a.size()[0]
+        return int(x // LEVEL_CHUNK_W), int((x + w) // LEVEL_CHUNK_W)
+
+    def _file(self, a: Actor):
+        """
+        Files a level actor under the chunks it touches now (and no more under the ones it touched before).
+        """
+        self._unfile(a)
+        self._filed[a] = first, last = self._chunk_span(a)
+        for c in range(first, last + 1):
+            self._chunks.setdefault(c, {})[a] = None
+
+    def _unfile(self, a: Actor):
+        first, last = self._filed.pop(a, (0, -1))
+        for c in range(first, last + 1):
+            self._chunks[c].pop(a, None)
+
+    def _stream(self, x: float):
+        """
+        Loads and unloads the chunks, so that the resident ones are the ones within the margin from x.
+        Called at every tick, as moving actors can cross a chunk boundary even when the window stays still.
+        """
+        if self._stream_margin is None:
+            return
+        window = int((x - self._stream_margin) // LEVEL_CHUNK_W), int((x + self._stream_margin) // LEVEL_CHUNK_W)
+
+        # Moving actors (such as zombies) are filed again under the chunks they touch now, wherever they have walked:
+        # the ones that left the resident chunks are unloaded, even if they got where the window never was
+        for a in self._moving:
+            if a in self._unloaded:
+                continue
+            if not self.is_alive(a): # Killed in the game: it is forgotten until the next reset
+                self._unfile(a)
+                continue
+            span = self._chunk_span(a)
+            if span != self._filed.get(a):
+                self._file(a)
+            if span[1] < window[0] or window[1] < span[0]:
+                self.kill(a)
+                self._unloaded.add(a)
+
+        if window == self._window:
+            return
+        old = range(self._window[0], self._window[1] + 1) if self._window else range(0)
+        new = range(window[0], window[1] + 1)
+        self._window = window
+
+        # Unloading: the actors of the chunks left behind that don't touch any resident chunk
+        for c in old:
+            if c in new:
+                continue
+            for a in list(self._chunks.get(c, ())):
+                if a in self._unloaded: # Already unloaded with another chunk
+                    continue
+                if not self.is_alive(a): # Killed in the game: it is forgotten until the next reset
+                    self._unfile(a)
+                    continue
+                first, last = self._filed[a]
+                if last < window[0] or window[1] < first:
+                    self.kill(a)
+                    self._unloaded.add(a)
+
+        # Loading: the unloaded actors of the new chunks are spawned again, in the order of the level
+        loading = set()
+        for c in new:
+            if c not in old:
+                loading.update(a for a in self._chunks.get(c, ()) if a in self._unloaded)
+        for a in sorted(loading, key=self._level_order.__getitem__):
+            self._unloaded.discard(a)
             self.spawn(a)
 
     def _manage_file(self, file_path: str):
-        with open(file_path, "r") as f:
-            for line in f:
-                line = line.strip()
-                if line != "" and line[0] != "#":
-                    option, value = line.split(": ")
-                    match option:   # Logic for every possible entry
-                        case "Hero_Start_Pos":
-                            self._hero_start_pos = tuple(int(v) for v in value.split(", "))
-                        case "Size":
-                            self._size = tuple(int(v) for v in value.split(", "))
-                        case "Lives":
-                            self._max_lives = self._current_lives = int(value)
-                        case "ZombieSpawnRate":
-                            self._zombie_spawn_rate = int(value)
-                        case "Enemies":
-                            if value != "[": raise ValueError("File is not well-formed")
-                            lines = []
-                            while (l := f.readline().strip()) != "]":
-                                lines.append(l)
-
-                            for l in lines:
-                                if l != "" and l[0] != "#":
-                                    option, value = l.split(": ")
-                                    match option: # Match for every possible static enemy
-                                        case "Plant":
-                                            vals = value.split(", ")
-                                            pos = int(vals[0]), int(vals[1])
-                                            self._static_enemies.append(Plant(pos))
-                                        case "Zombie":
-                                            vals = value.split(", ")
-                                            pos = int(vals[0]), int(vals[1])
-                                            direction = vals[2].strip()
-                                            self._static_enemies.append(Zombie(pos, direction))
-                                        case "Magician":
-                                            vals = value.split(", ")
-                                            pos = int(vals[0]), int(vals[1])
-                                            self._static_enemies.append(Magician(pos))
-
-                        case "Platforms":
-                            if value != "[": raise ValueError("File is not well-formed")
-                            lines = []
-                            while (l := f.readline().strip()) != "]":
-                                lines.append(l)
-
-                            for l in lines:
-                                if l != "" and l[0] != "#":
-                                    option, value = l.split(": ")
-                                    x, y, w, h = (int(v) for v in value.split(", "))
-                                    match option: # Match for every possible platform type
-                                        case "Ground":
-                                            self._platforms.append(Ground((x, y), (w, h)))
-                                        case "BackgroundPlatform":
-                                            self._platforms.append(BackgroundPlatform((x, y), (w, h)))
-                                        case "BackgroundLadder":
-                                            self._platforms.append(BackgroundLadder((x, y), (w, h)))
-                                        case "Grave":
-                                            self._platforms.append(Grave((x, y), (w, h)))
-                                        case "BackgroundWinArea":
-                                            self._platforms.append(BackgroundWinArea((x, y), (w, h)))
+        level = load_level(file_path) # Parsed only the first time, then loaded from its compiled file (see the level module)
+
+        if level.get_hero_start_pos() is not None:
+            self._hero_start_pos = level.get_hero_start_pos()
+        if level.get_size() is not None:
+            self._size = level.get_size()
+        if level.get_lives() is not None:
+            self._max_lives = self._current_lives = level.get_lives()
+        if level.get_zombie_spawn_rate() is not None:
+            self._zombie_spawn_rate = level.get_zombie_spawn_rate()
+
+        for kind, pos, direction in level.get_enemies():
+            match kind: # Match for every possible static enemy
+                case "Plant":
+                    self._static_enemies.append(Plant(pos))
+                case "Zombie":
+                    self._static_enemies.append(Zombie(pos, direction, self._random))
+                case "Magician":
+                    self._static_enemies.append(Magician(pos))
+
+        for kind, pos, size in level.get_platforms():
+            self._platforms.append(PLATFORM_CLASSES[kind](pos, size))
 
 class GngGui:
-    def __init__(self, config_path: str = None, bg_image: str = None, bg_crop_pos: tuple[int, int] = None, bg_size: tuple[int, int] = None, zoom = 1):
+    def __init__(self, config_path: str = None, bg_image: str = None, bg_crop_pos: tuple[int, int] = None, bg_size: tuple[int, int] = None, zoom = 1,
+                 seed: int = None, record_path: str = None, replay_path: str = None, dirty_rects: bool = False,
+                 scale_mode: str = "copy", fixed_step: bool = False, threaded: bool = False):
         """
         bg_image, bg_crop_pos and bg_size MUST be all specified, otherwise they will all be ignored.
         (The following notation is taken by JetBrains' IDEs (PyCharm, IntelliJ, ...), because I personally think they make everything clearer.
@@ -204,6 +351,17 @@ class GngGui:
         :param bg_crop_pos: Top-left corner (pixel) of passed bg_image to consider as background.
         :param bg_size: Width and height in pixels of cropped bg_image considered as background.
         :param zoom: Zoom level of the game window
+        :param seed: Seed of the game (see GngGame). Ignored when replaying.
+        :param record_path: If given, the keys of every frame are recorded and saved in this file when the program exits.
+        :param replay_path: If given, the game recorded in this file is replayed instead of reading the keyboard.
+        The window is closed when the recording ends.
+        :param dirty_rects: If True, only the parts of the window drawn in a frame are presented (see g2d.init_canvas).
+        :param scale_mode: How the canvas is zoomed: "copy", "into" or "sdl" (see g2d.init_canvas).
+        :param fixed_step: If True, the game is updated at a fixed rate whatever the time spent drawing it: when a frame
+        is late, the game runs more ticks to catch up, and it is drawn once (see g2d.main_loop).
+        If False, the game is drawn and updated once per frame, so it slows down with the frame rate.
+        :param threaded: If True, the game is updated on a thread of its own, at a fixed rate (as with fixed_step), and
+        the main thread only draws the latest snapshot of it (see the pipeline module), so the two can overlap.
         """
         if not all((bg_image, bg_crop_pos, bg_size)):
             self._bg_image = None
@@ -214,11 +372,26 @@ class GngGui:
             self._bg_crop_pos = bg_crop_pos
             self._bg_size = bg_size
 
+        # Recording / Replay
+        self._recording: Recording | None = None
+        self._replay = None # Iterator over the keys of the recorded frames
+        if replay_path:
+            recording = Recording.load(replay_path)
+            seed = recording.get_seed()
+            config_path = config_path or recording.get_config_path() or None
+            self._replay = recording.frames()
+
         # Game
-        self._game = GngGame(bg_size, (112, 171), config_path) # Default numbers (just in case they are not present anywhere else)
+        self._game = GngGame(bg_size, (112, 171), config_path, seed) # Default numbers (just in case they are not present anywhere else)
+        if record_path:
+            self._recording = Recording(self._game.get_seed(), config_path or "")
+            atexit.register(self._recording.save, record_path)
+        # The camera belongs to the simulation side, as it follows the hero and reads the keys of the game: it is only
+        # moved in _snapshot, while drawing uses the position recorded in each snapshot (its size never changes)
         self._view = View((0, 0), (VIEW_W, VIEW_H)) # Fixed numbers
         self._paused = False
         self._max_pause_cooldown, self._pause_cooldown = 5, 0
+        self._simulation: SimulationThread | None = None # Only in the threaded mode
 
         self._game_won = self._game.game_won()
         self._game_over = self._game.game_over()
@@ -248,15 +421,39 @@ class GngGui:
 
         self.gui_height()
 
-        import src.framework.g2d as g2d # Lazy import just to be sure to avoid any circular imports (even it there aren't)
+        g2d.init_canvas((view_w, self.gui_height()), zoom, dirty_rects, scale_mode)
 
-        g2d.init_canvas((view_w, self.gui_height()), zoom)
+        ## Assets
+        # They are decoded in background (after the canvas, so they are converted to the display format when they are
+        # ready): until then the game is drawn with placeholders, and the HUD shows the progress.
+        g2d.load_assets([SPRITESHEET] + ([self._bg_image] if self._bg_image is not None else []))
+
+        ## Background
+        # The background is sliced in chunks, so that each frame only the ones under the view are drawn.
+        # Each chunk is a (x offset in the background, crop position, crop size) tuple.
+        self._bg_chunks = []
+        if self._bg_image is not None:
+            bg_x, bg_y = self._bg_crop_pos
+            bg_w, bg_h = self._bg_size
+            for x in range(0, bg_w, BG_CHUNK_W):
+                self._bg_chunks.append((x, (bg_x + x, bg_y), (min(BG_CHUNK_W, bg_w - x), bg_h)))
 
         ## Music elements
         # g2d.play_audio(os.path.join(ROOT_PATH, "sounds/game_start.mp3"))
         # self._music_playing = False
 
-        g2d.main_loop(self.tick)
+        if threaded:
+            self._keys = [] # Keys read by the main thread for the simulation thread
+            self._buffer, self._drawn = DoubleBuffer(), 0 # Snapshots, and the number of the last one drawn
+            self._buffer.publish(self._snapshot())
+            self._simulation = SimulationThread(self._simulation_step)
+            atexit.register(self._simulation.stop) # Registered after the recording, so the thread is stopped before saving it
+            self._simulation.start()
+            g2d.main_loop(self.render)
+        elif fixed_step:
+            g2d.main_loop(self.render, update=self.update)
+        else:
+            g2d.main_loop(self.tick)
 
     def gui_height(self):
         total_height = self._view.size()[1]
@@ -265,49 +462,138 @@ class GngGui:
         return total_height
 
     def tick(self):
-        # Clear background
-        if self._bg_image is not None:
-            g2d.draw_image(self._bg_image, remove_pos((0, 0), self._view.pos()), self._bg_crop_pos, self._bg_size)
-        else:
-            g2d.clear_canvas()
+        """
+        A whole frame: the game is drawn, then updated.
+        """
+        self.render()
+        self.update()
+
+    def update(self, keys: list[str] = None) -> bool:
+        """
+        Simulation only: reads the keys (or the recording) and runs one tick of the game, unless it is paused.
+        :param keys: Keys pressed in this tick. By default, they are read from g2d.
+        :return: False if the recording being replayed is over, True otherwise.
+        """
+        if keys is None:
+            keys = g2d.current_keys()
 
         # Check pause
-        if "p" in g2d.current_keys() and self._pause_cooldown <= 0:
+        if "p" in keys and self._pause_cooldown <= 0:
             self._paused = not self._paused
             self._pause_cooldown = self._max_pause_cooldown
 
         if self._pause_cooldown > 0:
             self._pause_cooldown -= 1
 
-        # Draw actors
         if not self._paused:
-            for a in self._game.actors():
-                if a.sprite() is not None:
-                    g2d.draw_image(os.path.join(ROOT_PATH, "img" , "ghosts-goblins.png"), remove_pos(a.pos(), self._view.pos()), a.sprite(), a.size())
-                else:
-                    ## Demo Background Mode
-                    if self._bg_image is None: # If there is no background, all the elements that are pre-rendered in it will be drawn as colour-coded rectangles
-                        g2d.set_color(self._type_colour(type(a).__name__)) # The colour codes are defined in the ._type_colour method
-                        g2d.draw_rect(remove_pos(a.pos(), self._view.pos()), a.size())
+            if self._replay is not None:
+                keys = next(self._replay, None)
+                if keys is None: # The recording is over
+                    if self._simulation is None: # Otherwise, the main thread closes the window (see render)
+                        g2d.close_canvas()
+                    return False
+
+            if self._recording is not None:
+                self._recording.record(keys)
+            self._game.tick(keys) # Arena update
+        return True
+
+    def render(self):
+        """
+        Drawing only: the actors in the view, the HUD and the pause menu. The game is not changed.
+        In the threaded mode, what is drawn is the latest snapshot published by the simulation thread.
+        """
+        if self._simulation is None:
+            self._draw(self._snapshot())
+            return
+
+        self._keys = g2d.current_keys() # Read here for the simulation thread, as the window belongs to this one
+        if self._simulation.stopped(): # The recording is over (or the simulation failed)
+            g2d.close_canvas()
+            return
+        count, snapshot = self._buffer.latest()
+        if count != self._drawn: # Otherwise, the canvas already shows it
+            self._drawn = count
+            self._draw(snapshot)
+
+    def _simulation_step(self) -> bool:
+        """
+        A tick of the simulation thread: the game is updated, then what has to be drawn is published.
+        """
+        if self.update(self._keys) is False:
+            return False
+        self._buffer.publish(self._snapshot())
+        return True
+
+    def _snapshot(self) -> Snapshot:
+        """
+        Collects everything needed to draw the game as it is now, then moves the camera for the next frame.
+        In the threaded mode it runs on the simulation thread, like the game and the camera it moves: the main thread
+        only sees the snapshots.
+        """
+        view_pos, view_size = self._view.pos(), self._view.size()
+        records = ()
+        if not self._paused:
+            visible = self._game.actors_in(view_pos, view_size)
+            if (projectiles := self._game.role(PROJECTILES_ROLE)) is not None: # Projectiles are drawn over the other actors
+                visible += projectiles.actors_in(view_pos, view_size)
+            records = tuple((a.sprite(), a.pos(), a.size(), type(a).__name__) for a in visible)
 
             # The view can be assigned an actor to follow, so in case Arthur died, the new Arthur will be followed instead.
             self._view.set_actor(self._game.get_hero())
 
+        snapshot = Snapshot(view_pos, records, self._game.get_lives(), self._game.get_max_lives(),
+                            self._game.game_won(), self._game.game_over(), self._paused)
+        self._view.move(self._game) # Camera update
+        return snapshot
+
+    def _draw(self, snapshot: Snapshot):
+        """
+        Draws a snapshot of the game (see _snapshot). Only g2d is used, never the game.
+        """
+        # Clear background
+        # GUI elements are only drawn again when they change, as they stay on the canvas: if it is cleared, they must be invalidated.
+        if self._bg_image is None:
+            g2d.clear_canvas()
+            self._invalidate_gui()
+
+        # Draw actors (only the ones that can be seen)
+        if not snapshot.is_paused():
+            if self._bg_image is not None:
+                self._draw_background(snapshot.get_view_pos())
+            self._pause_menu.invalidate() # The game view is drawn over it
+
+            view_h = self._view.size()[1]
+            view_pos = snapshot.get_view_pos()
+            for sprite, pos, size, kind in snapshot.get_records():
+                if pos[1] - view_pos[1] + size[1] > view_h:
+                    self._invalidate_gui() # The actor is partially drawn over the HUD
+                if sprite is not None:
+                    g2d.draw_image(SPRITESHEET, remove_pos(pos, view_pos), sprite, size)
+                else:
+                    ## Demo Background Mode
+                    if self._bg_image is None: # If there is no background, all the elements that are pre-rendered in it will be drawn as colour-coded rectangles
+                        g2d.set_color(self._type_colour(kind)) # The colour codes are defined in the ._type_colour method
+                        g2d.draw_rect(remove_pos(pos, view_pos), size)
+
             # Text generation for the HUD
-            if self._game.game_won():
+            if (progress := g2d.load_progress()) < 1:
+                self._life_label.set_text_align("Center")
+                self._life_label.set_text(f"Loading: {progress:.0%}")
+            elif snapshot.game_won():
                 self._life_label.set_text_align("Center")
                 self._life_label.set_text("Congratulations: you won!")
-            elif self._game.game_over():
+            elif snapshot.game_over():
                 self._life_label.set_text_align("Center")
                 self._life_label.set_text("Game over!")
             else:
                 self._life_label.set_text_align("Center")
-                self._life_label.set_text(f"Lives: {self._game.get_lives()}/{self._game.get_max_lives()}")
+                self._life_label.set_text(f"Lives: {snapshot.get_lives()}/{snapshot.get_max_lives()}")
         else:
             self._pause_menu.draw()
 
         ## HUD graphic update
-        self._life_counter.set_lives(self._game.get_lives())
+        self._life_counter.set_lives(snapshot.get_lives())
 
         for e in self._gui_elements:
             e.draw()
@@ -336,10 +622,22 @@ class GngGui:
         #     g2d.play_audio(os.path.join(ROOT_PATH, "sounds", "game_over.mp3"))
         #     self._game_over = True
 
-        self._view.move(self._game) # Camera update
+    def _invalidate_gui(self):
+        for e in self._gui_elements:
+            e.invalidate()
+        self._pause_menu.invalidate()
 
-        if not self._paused:
-            self._game.tick(g2d.current_keys()) # Arena update
+    def _draw_background(self, view_pos: Point):
+        """
+        Draws the background chunks under the view (one or two).
+        :param view_pos: Position of the view when the frame was taken (see _snapshot).
+        """
+        vx, vy = view_pos
+        offset_x, offset_y = round(-vx), round(-vy) # Rounded once, so that the chunks are drawn side by side with no gaps
+        first = int(vx // BG_CHUNK_W)
+        end = int(-(-(vx + self._view.size()[0]) // BG_CHUNK_W)) # ceil div: index after the last visible chunk
+        for x, crop_pos, crop_size in self._bg_chunks[first:end]:
+            g2d.draw_image(self._bg_image, (x + offset_x, offset_y), crop_pos, crop_size)
 
     def _type_colour(self, actor_type: str) -> tuple[int, int, int]:
         """
@@ -361,6 +659,66 @@ class GngGui:
             case "BackgroundWinArea": return 0, 255, 255
             case _: return 0, 0, 0
 
+# TESTING
+import unittest
+
+class StreamingTest(unittest.TestCase):
+    def _level_zombie(self, game: GngGame) -> Zombie:
+        return next(a for a in game.actors() if isinstance(a, Zombie) and a.pos() == (242, 192)) # See configs/level1.txt
+
+    def test_streaming(self):
+        config = os.path.join(ROOT_PATH, "configs", "level1.txt")
+        game = GngGame(file_path=config, seed=1)
+        whole = GngGame(file_path=config, seed=1, stream_margin=None)
+        self.assertLess(len(game.actors()), len(whole.actors()))
+        self.assertTrue(any(a.is_static() and a.pos()[0] > 3000 for a in whole.actors()))
+        self.assertFalse(any(a.is_static() and a.pos()[0] > 3000 for a in game.actors()))
+
+        # Arthur goes to the end of the level and back: the chunks he left are loaded again, with the same actors
+        start = [a for a in game.actors() if a.is_static()]
+        game.get_hero()._x = 3200
+        game.tick()
+        self.assertTrue(any(a.is_static() and a.pos()[0] > 3000 for a in game.actors()))
+        self.assertFalse(any(game.is_alive(a) for a in start if a.pos()[0] + a.size()[0] < 1500))
+        game.get_hero()._x = 112
+        game.tick()
+        self.assertTrue(all(game.is_alive(a) for a in start))
+
+    def test_moving_actor(self):
+        # The zombie of the level walks into another resident chunk: it goes with that chunk, not with the one it left
+        game = GngGame(file_path=os.path.join(ROOT_PATH, "configs", "level1.txt"), seed=1)
+        zombie = self._level_zombie(game)
+        zombie._x = 850
+        game.tick()
+        game.get_hero()._x = 1400 # The chunk the zombie came from is left behind, the one it is in stays
+        game.tick()
+        self.assertTrue(game.is_alive(zombie))
+        game.get_hero()._x = 2300 # Its chunk is left behind too
+        game.tick()
+        self.assertFalse(game.is_alive(zombie))
+        game.get_hero()._x = 112
+        game.tick()
+        self.assertTrue(game.is_alive(zombie))
+        self.assertEqual(850, zombie.pos()[0])
+
+    def test_moving_actor_still_window(self):
+        # Arthur stands still, so the window doesn't change, while the zombie of the level crosses the chunks
+        game = GngGame(file_path=os.path.join(ROOT_PATH, "configs", "level1.txt"), seed=1)
+        zombie = self._level_zombie(game)
+        game.tick()
+        zombie._x = LEVEL_CHUNK_W + 10 # Into the next chunk, still resident: it is filed under it at once
+        game.tick()
+        self.assertTrue(game.is_alive(zombie))
+        self.assertEqual(game._chunk_span(zombie), game._filed[zombie])
+        outside = (game.get_hero().pos()[0] + STREAM_MARGIN) // LEVEL_CHUNK_W * LEVEL_CHUNK_W + LEVEL_CHUNK_W + 10
+        zombie._x = outside # Out of the window: it is unloaded at once
+        game.tick()
+        self.assertFalse(game.is_alive(zombie))
+        game.get_hero()._x = outside # Its chunk is loaded again, with the zombie where it was
+        game.tick()
+        self.assertTrue(game.is_alive(zombie))
+
+
 if __name__ == "__main__":
     gui = GngGui(
         config_path= os.path.join(ROOT_PATH, "configs", "demo.txt"),
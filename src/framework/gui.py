@@ -6,7 +6,7 @@ This project on GitHub: https://github.com/GioTFG/Ghosts-and-Goblins
 
 import os
 
-from src.framework import g2d
+from src.framework.backend import g2d
 from src.framework.actor import Arena, Actor, Point
 from src.framework.utilities import remove_pos
 
@@ -72,12 +72,15 @@ class GuiElement:
     Each GUI element must have a position (x, y) and a size (w, h).
     They can change during the execution, so they must have getter methods for them.
     They also must have a draw function.
+    An element that looks the same as the last time it was drawn doesn't need to be drawn again (see _state), as it is
+    still on the canvas; if something is drawn over it, it must be invalidated.
     """
 
     def __init__(self, pos: Point, size: Point):
         self._x, self._y = pos
         self._w, self._h = size
         self._sub_elements = []
+        self._drawn_state = None # What _state returned at the last draw
 
     def draw(self):
         """
@@ -86,6 +89,32 @@ class GuiElement:
         """
         raise NotImplementedError("Abstract method")
 
+    def invalidate(self):
+        """
+        Forces the element to be drawn again by the next draw call.
+        """
+        self._drawn_state = None
+
+    def _state(self) -> tuple:
+        """
+        Everything that changes how the element looks.
+        """
+        return self.get_pos() + self.get_size()
+
+    def _needs_redraw(self) -> bool:
+        """
+        Returns True (and remembers the current state as drawn) if the element looks different from the last time it was drawn.
+        While the assets are loading, it is always drawn, as it could have been drawn with placeholders (see g2d.load_assets).
+        """
+        if g2d.load_progress() < 1:
+            self._drawn_state = None
+            return True
+        state = self._state()
+        if state == self._drawn_state:
+            return False
+        self._drawn_state = state
+        return True
+
     def get_pos(self):
         return self._x, self._y
 
@@ -217,6 +246,9 @@ class TextElement(GuiElement):
         self._margin = 2
 
     def draw(self):
+        if not self._needs_redraw():
+            return # It is still on the canvas as it was drawn the last time
+
         # Background
         g2d.set_color(self._bg_colour)
         g2d.draw_rect(self.get_pos(), self.get_size())
@@ -233,6 +265,9 @@ class TextElement(GuiElement):
 
         self._draw_text(text_pos)
 
+    def _state(self) -> tuple:
+        return super()._state() + (self._text, self._text_align, self._bg_colour)
+
     # -- SETTER METHODS --
     def set_text(self, text: str):
         self._text = text
@@ -300,6 +335,10 @@ class LifeCounter(TextElement):
     def set_lives(self, lives: int):
         self._lives = lives
 
+    def _state(self) -> tuple:
+        # The text is only used internally while drawing, so it is not part of the state
+        return self.get_pos() + self.get_size() + (self._bg_colour, self._lives)
+
     def _draw_text(self, pos: Point):
         if self._lives > 0:
             self._text = "("
@@ -316,4 +355,21 @@ class LifeCounter(TextElement):
         if self._lives > 0:
             return  13 * self._lives + 2 * self.CHARACTER_SIZE[0]
 
-        return 0
\ No newline at end of file
+        return 0
+
+
+# TESTING
+import unittest.mock
+
+class GuiElementTest(unittest.TestCase):
+    def test_redraw_after_loading(self):
+        label = TextElement((0, 0), (100, 20))
+        label.set_text("CREDITS")
+        with unittest.mock.patch.object(g2d, "draw_image") as draw_image:
+            with unittest.mock.patch.object(g2d, "load_progress", return_value=0.5): # The spritesheet is still pending
+                label.draw()
+                label.draw()
+                self.assertEqual(2 * len("CREDITS"), draw_image.call_count)
+            label.draw() # Loaded: drawn once more with the real sprites, then left on the canvas
+            label.draw()
+            self.assertEqual(3 * len("CREDITS"), draw_image.call_count)
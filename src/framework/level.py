@@ -0,0 +1,293 @@
+"""
+Module created by Giovanni Ancora for a project at UniPr.
+@author Giovanni Ancora (https://github.com/GioTFG and https://github.com/GiovanniAncora)
+This project on GitHub: https://github.com/GioTFG/Ghosts-and-Goblins
+
+Level config files (see configs/level1.txt): parsing, validation and compiled cache.
+
+A config file is parsed and validated only the first time it is loaded: the resulting Level is compiled into a compact
+binary file, saved in a __pycache__ folder next to the config, and later loaded from there through mmap.
+The name of the compiled file contains the SHA-256 hash of the text, so when the text changes it is compiled again
+(and the stale file is removed). Inside the same process, a level is loaded only once while the file is unchanged.
+
+The compiled format (little-endian):
+- the magic bytes b"GNGL", the format version and the 32 bytes of the hash of the text;
+- a bitmask of the options present in the text, followed by Hero_Start_Pos, Size, Lives and ZombieSpawnRate (0 if absent);
+- the number of enemies and of platforms;
+- the enemies, as (kind, x, y, direction) records, and the platforms, as (kind, x, y, w, h) records,
+  where kind is an index in ENEMY_KINDS or PLATFORM_KINDS and direction one in DIRECTIONS.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+
+MAGIC, VERSION = b"GNGL", 1
+
+ENEMY_KINDS = ("Plant", "Zombie", "Magician")
+PLATFORM_KINDS = ("Ground", "BackgroundPlatform", "BackgroundLadder", "Grave", "BackgroundWinArea")
+DIRECTIONS = ("", "Left", "Right")
+
+_HEADER = struct.Struct("<4sH32s")
+_OPTIONS = struct.Struct("<B6iII") # Presence bitmask, the six option values, number of enemies and of platforms
+_ENEMY = struct.Struct("<B2iB")
+_PLATFORM = struct.Struct("<B4i")
+
+_levels = {} # (path, mtime, size) -> Level, loaded in this process
+
+
+class Level:
+    """
+    The blueprint of a level, as described by its config file: the actors are created from it by GngGame.
+    Options that are not in the file are None.
+    """
+    def __init__(self, hero_start_pos: tuple[int, int] = None, size: tuple[int, int] = None, lives: int = None,
+                 zombie_spawn_rate: int = None, enemies: tuple = (), platforms: tuple = ()):
+        """
+        :param enemies: (kind, (x, y), direction) tuples, in file order. Direction is "" for enemies without one.
+        :param platforms: (kind, (x, y), (w, h)) tuples, in file order.
+        """
+        self._hero_start_pos = hero_start_pos
+        self._size = size
+        self._lives = lives
+        self._zombie_spawn_rate = zombie_spawn_rate
+        self._enemies = tuple(enemies)
+        self._platforms = tuple(platforms)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Level) and vars(self) == vars(other)
+
+    # -- GETTER METHODS --
+    def get_hero_start_pos(self) -> tuple[int, int] | None:
+        return self._hero_start_pos
+
+    def get_size(self) -> tuple[int, int] | None:
+        return self._size
+
+    def get_lives(self) -> int | None:
+        return self._lives
+
+    def get_zombie_spawn_rate(self) -> int | None:
+        return self._zombie_spawn_rate
+
+    def get_enemies(self) -> tuple:
+        return self._enemies
+
+    def get_platforms(self) -> tuple:
+        return self._platforms
+
+    # -- FILE METHODS --
+    def compile(self, digest: bytes) -> bytes:
+        """
+        Returns the compiled level.
+        :param digest: SHA-256 hash of the text the level comes from.
+        """
+        options = (self._hero_start_pos, self._size, self._lives, self._zombie_spawn_rate)
+        mask = sum(1 << i for i, o in enumerate(options) if o is not None)
+        values = (self._hero_start_pos or (0, 0)) + (self._size or (0, 0)) + (self._lives or 0, self._zombie_spawn_rate or 0)
+
+        out = bytearray(_HEADER.pack(MAGIC, VERSION, digest))
+        out += _OPTIONS.pack(mask, *values, len(self._enemies), len(self._platforms))
+        for kind, (x, y), direction in self._enemies:
+            out += _ENEMY.pack(ENEMY_KINDS.index(kind), x, y, DIRECTIONS.index(direction))
+        for kind, (x, y), (w, h) in self._platforms:
+            out += _PLATFORM.pack(PLATFORM_KINDS.index(kind), x, y, w, h)
+        return bytes(out)
+
+    @classmethod
+    def load_compiled(cls, path: str, digest: bytes) -> "Level":
+        """
+        Loads a compiled level through mmap.
+        :raise ValueError: If the file is not a compiled level of this version, or it was compiled from another text.
+        """
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            magic, version, file_digest = _HEADER.unpack_from(data)
+            if magic != MAGIC or version != VERSION or file_digest != digest:
+                raise ValueError(f"{path} is not a compiled level of this text")
+            mask, hx, hy, w, h, lives, rate, n_enemies, n_platforms = _OPTIONS.unpack_from(data, _HEADER.size)
+
+            i = _HEADER.size + _OPTIONS.size
+            j = i + n_enemies * _ENEMY.size
+            if j + n_platforms * _PLATFORM.size != len(data):
+                raise ValueError(f"{path} is truncated")
+            enemies = tuple((ENEMY_KINDS[k], (x, y), DIRECTIONS[d]) for k, x, y, d in _ENEMY.iter_unpack(data[i:j]))
+            platforms = tuple((PLATFORM_KINDS[k], (x, y), (pw, ph)) for k, x, y, pw, ph in _PLATFORM.iter_unpack(data[j:]))
+
+        return cls((hx, hy) if mask & 1 else None, (w, h) if mask & 2 else None, lives if mask & 4 else None,
+                   rate if mask & 8 else None, enemies, platforms)
+
+
+def _ints(value: str, n: int, where: str) -> tuple[int, ...]:
+    """
+    Parses a "<int>, <int>, ..." value made of n integers.
+    """
+    values = value.split(",")
+    if len(values) != n:
+        raise ValueError(f"{where}: expected {n} values, found {len(values)}")
+    try:
+        return tuple(int(v) for v in values)
+    except ValueError:
+        raise ValueError(f"{where}: expected integers, found {value!r}") from None
+
+def parse_level(text: str, path: str = "<level>") -> Level:
+    """
+    Parses and validates the text of a config file.
+    Unknown options, enemies and platforms are ignored, as in the first versions of the game.
+    :param path: Used in the error messages.
+    :raise ValueError: If the text is not well-formed, with the line of the error.
+    """
+    options = {}
+    enemies, platforms = [], []
+    lines = iter(enumerate(text.splitlines(), 1))
+    for n, line in lines:
+        line = line.strip()
+        if line == "" or line[0] == "#":
+            continue
+        where = f"{path}:{n}"
+        option, sep, value = line.partition(": ")
+        if not sep:
+            raise ValueError(f"{where}: expected '<option>: <value>', found {line!r}")
+
+        match option: # Logic for every possible entry
+            case "Hero_Start_Pos" | "Size":
+                options[option] = _ints(value, 2, where)
+            case "Lives" | "ZombieSpawnRate":
+                options[option] = _ints(value, 1, where)[0]
+            case "Enemies" | "Platforms":
+                if value != "[": raise ValueError(f"{where}: expected '[' after {option}")
+                for n, l in lines:
+                    l = l.strip()
+                    if l == "]":
+                        break
+                    if l == "" or l[0] == "#":
+                        continue
+                    where = f"{path}:{n}"
+                    kind, sep, value = l.partition(": ")
+                    if not sep:
+                        raise ValueError(f"{where}: expected '<type>: <values>', found {l!r}")
+                    if option == "Enemies":
+                        if kind == "Zombie":
+                            *pos, direction = value.split(",")
+                            direction = direction.strip()
+                            if direction not in DIRECTIONS[1:]:
+                                raise ValueError(f"{where}: unknown direction {direction!r}")
+                            enemies.append((kind, _ints(",".join(pos), 2, where), direction))
+                        elif kind in ENEMY_KINDS:
+                            enemies.append((kind, _ints(value, 2, where), ""))
+                    elif kind in PLATFORM_KINDS:
+                        x, y, w, h = _ints(value, 4, where)
+                        platforms.append((kind, (x, y), (w, h)))
+                else:
+                    raise ValueError(f"{path}: missing ']' after {option}")
+
+    return Level(options.get("Hero_Start_Pos"), options.get("Size"), options.get("Lives"),
+                 options.get("ZombieSpawnRate"), enemies, platforms)
+
+def compiled_path(path: str, digest: bytes) -> str:
+    """
+    Returns where the level compiled from a config file with the given hash is cached.
+    """
+    folder, name = os.path.split(os.path.abspath(path))
+    return os.path.join(folder, "__pycache__", f"{name}.{digest.hex()[:16]}.gngl")
+
+def load_level(path: str) -> Level:
+    """
+    Loads a level config file: from memory if it was already loaded and it is unchanged, otherwise from its compiled
+    file if the text has not changed since it was compiled, otherwise by parsing the text (and compiling it).
+    If the compiled file cannot be written (e.g. a read-only folder), the level is simply parsed every time.
+    """
+    stat = os.stat(path)
+    key = os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+    if key in _levels:
+        return _levels[key]
+
+    with open(path, "rb") as f:
+        text = f.read()
+    digest = hashlib.sha256(text).digest()
+    cache = compiled_path(path, digest)
+    try:
+        level = Level.load_compiled(cache, digest)
+    except (OSError, ValueError, struct.error):
+        level = parse_level(text.decode("utf-8"), path)
+        _save_compiled(level, digest, path)
+
+    _levels[key] = level
+    return level
+
+def _save_compiled(level: Level, digest: bytes, path: str):
+    cache = compiled_path(path, digest)
+    folder, name = os.path.split(cache)
+    prefix = os.path.basename(path) + "."
+    try:
+        os.makedirs(folder, exist_ok=True)
+        tmp = f"{cache}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(level.compile(digest))
+        os.replace(tmp, cache) # Atomic, for batch runs loading the same level in many processes
+        for other in os.listdir(folder): # Levels compiled from older versions of the text
+            if other != name and other.startswith(prefix) and other.endswith(".gngl") and "." not in other[len(prefix):-5]:
+                os.remove(os.path.join(folder, other))
+    except OSError:
+        pass
+
+
+# TESTING
+import unittest
+import tempfile
+
+class LevelTest(unittest.TestCase):
+    TEXT = """
+# A comment
+Hero_Start_Pos: 94, 152
+Size: 3584, 240
+Enemies: [
+    Plant: 1020, 90
+
+    Zombie: 242, 192, Right
+    Dragon: 1, 2
+]
+Platforms: [
+    Ground: 0, 204, 1665, 36
+    # Another comment
+    Grave: 242, 172, 16, 16
+]
+"""
+
+    def test_parse(self):
+        level = parse_level(self.TEXT)
+        self.assertEqual((94, 152), level.get_hero_start_pos())
+        self.assertEqual((3584, 240), level.get_size())
+        self.assertIsNone(level.get_lives())
+        self.assertEqual((("Plant", (1020, 90), ""), ("Zombie", (242, 192), "Right")), level.get_enemies())
+        self.assertEqual((("Ground", (0, 204), (1665, 36)), ("Grave", (242, 172), (16, 16))), level.get_platforms())
+
+    def test_errors(self):
+        for text in ("Size: 10", "Size: a, b", "Enemies: [\nPlant: 1, 2\n", "Enemies: [\nZombie: 1, 2, Up\n]", "Size 10, 10"):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                parse_level(text)
+
+    def test_compiled_cache(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "level.txt")
+            with open(path, "w") as f:
+                f.write(self.TEXT)
+            level = load_level(path)
+            self.assertEqual(parse_level(self.TEXT), level)
+            digest = hashlib.sha256(self.TEXT.encode()).digest()
+            self.assertEqual(level, Level.load_compiled(compiled_path(path, digest), digest))
+
+            # The text changes: the level is compiled again, and the stale file removed
+            with open(path, "a") as f:
+                f.write("Lives: 5\n")
+            self.assertEqual(5, load_level(path).get_lives())
+            self.assertEqual(1, len(os.listdir(os.path.join(d, "__pycache__"))))
+
+
+if __name__ == "__main__":
+    # Usage: python -m src.framework.level <config file>...
+    # Validates and compiles the config files.
+    for p in sys.argv[1:]:
+        lvl = load_level(p)
+        print(f"{p}: {len(lvl.get_enemies())} enemies, {len(lvl.get_platforms())} platforms")
@@ -0,0 +1,172 @@
+"""
+Module created by Giovanni Ancora for a project at UniPr.
+@author Giovanni Ancora (https://github.com/GioTFG and https://github.com/GiovanniAncora)
+This project on GitHub: https://github.com/GioTFG/Ghosts-and-Goblins
+
+Pieces of the threaded game loop (see GngGui): the game is simulated on a thread of its own, while the main thread
+only draws it.
+After every tick, the simulation thread publishes a Snapshot of everything that must be drawn into a DoubleBuffer,
+from which the main thread takes the latest one in each frame.
+Snapshots are never changed after being published, so the two threads share nothing else and need no other lock.
+As SDL releases the GIL while blitting and presenting, drawing a frame and simulating the next tick can overlap.
+
+The main thread is the one drawing (and not another one) because SDL expects the window and its events to be handled
+by the thread that created them.
+"""
+
+import threading
+import time
+
+from src.framework.actor import Point
+
+# (sprite position in the spritesheet or None, position, size, name of the actor class)
+DrawRecord = tuple[Point | None, Point, Point, str]
+
+
+class Snapshot:
+    """
+    What is drawn in a frame: the actors in the view (as draw records) and what is shown in the HUD.
+    """
+    __slots__ = ("_view_pos", "_records", "_lives", "_max_lives", "_won", "_over", "_paused")
+
+    def __init__(self, view_pos: Point, records: tuple[DrawRecord, ...], lives: int, max_lives: int, won: bool,
+                 over: bool, paused: bool):
+        """
+        :param view_pos: Position of the view in the level.
+        :param records: Actors to draw, in drawing order.
+        """
+        self._view_pos = view_pos
+        self._records = records
+        self._lives = lives
+        self._max_lives = max_lives
+        self._won = won
+        self._over = over
+        self._paused = paused
+
+    # -- GETTER METHODS --
+    def get_view_pos(self) -> Point:
+        return self._view_pos
+
+    def get_records(self) -> tuple[DrawRecord, ...]:
+        return self._records
+
+    def get_lives(self) -> int:
+        return self._lives
+
+    def get_max_lives(self) -> int:
+        return self._max_lives
+
+    def game_won(self) -> bool:
+        return self._won
+
+    def game_over(self) -> bool:
+        return self._over
+
+    def is_paused(self) -> bool:
+        return self._paused
+
+
+class DoubleBuffer:
+    """
+    Two slots: the writer fills the back one and then swaps them, so the reader always finds a complete snapshot in
+    the front one, however far the writer is.
+    Snapshots are numbered, so the reader can tell whether there is a new one since the last time.
+    """
+    def __init__(self):
+        self._slots = [(0, None), (0, None)]
+        self._front = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def publish(self, snapshot) -> None:
+        self._count += 1 # Only the writer changes it
+        back = 1 - self._front
+        self._slots[back] = (self._count, snapshot)
+        with self._lock:
+            self._front = back
+
+    def latest(self) -> tuple[int, object]:
+        """
+        :return: The number of the latest snapshot (0 if none was published yet) and the snapshot itself.
+        """
+        with self._lock:
+            return self._slots[self._front]
+
+
+class SimulationThread(threading.Thread):
+    """
+    Calls step at a fixed rate, catching up (at most max_updates times in a row) when it is late, like
+    g2d.main_loop with an update function.
+    It runs until stop is called, or step raises an exception, or returns False.
+    """
+    def __init__(self, step, fps: int | None = 30, max_updates: int = 5):
+        """
+        :param step: Function called once per tick.
+        :param fps: Ticks per second. If None, the ticks are run one after the other, without ever waiting.
+        """
+        super().__init__(name="simulation", daemon=True)
+        self._step = step
+        self._period = 1 / fps if fps else 0
+        self._max_updates = max_updates
+        self._stop_event = threading.Event()
+
+    def run(self):
+        try:
+            lag, last = 0.0, time.perf_counter()
+            while not self._stop_event.is_set():
+                now = time.perf_counter()
+                lag, last = lag + now - last, now
+                updates = 0
+                while lag >= self._period and updates < self._max_updates:
+                    if self._step() is False:
+                        return
+                    lag -= self._period
+                    updates += 1
+                if self._period and lag >= self._period:
+                    lag %= self._period # Too late to catch up: the game slows down instead
+                self._stop_event.wait(max(self._period - lag, 0))
+        finally:
+            self._stop_event.set()
+
+    def stop(self, timeout: float = 1) -> None:
+        self._stop_event.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
+
+    def stopped(self) -> bool:
+        return self._stop_event.is_set()
+
+
+# TESTING
+import unittest
+
+class PipelineTest(unittest.TestCase):
+    def test_double_buffer(self):
+        buffer = DoubleBuffer()
+        self.assertEqual((0, None), buffer.latest())
+        buffer.publish("a")
+        buffer.publish("b")
+        self.assertEqual((2, "b"), buffer.latest())
+
+    def test_simulation_thread(self):
+        buffer = DoubleBuffer()
+
+        def step():
+            buffer.publish(buffer.latest()[0] + 1)
+            return buffer.latest()[1] < 100
+
+        thread = SimulationThread(step, fps=None)
+        thread.start()
+        thread.join(5)
+        self.assertTrue(thread.stopped())
+        self.assertEqual((100, 100), buffer.latest())
+
+    def test_stop(self):
+        thread = SimulationThread(lambda: None, fps=1000)
+        thread.start()
+        thread.stop()
+        self.assertFalse(thread.is_alive())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,210 @@
+"""
+Module created by Giovanni Ancora for a project at UniPr.
+@author Giovanni Ancora (https://github.com/GioTFG and https://github.com/GiovanniAncora)
+This project on GitHub: https://github.com/GioTFG/Ghosts-and-Goblins
+
+Recording and replaying of games.
+A game is completely determined by its level, its seed and the keys pressed in every frame, so only these are saved.
+
+The file format is compact, as games last many thousands of frames, but the pressed keys rarely change:
+- the magic bytes b"GNGR" and the format version;
+- the seed and the path of the level config file;
+- the table of the keys used during the game: the i-th key is bit i of the frame bitmasks;
+- the frames, as (bitmask, number of consecutive frames with that bitmask) runs, until the end of the file.
+Every integer is an unsigned LEB128 varint, every string is its length followed by its UTF-8 bytes.
+"""
+
+import argparse
+import os
+import time
+
+MAGIC, VERSION = b"GNGR", 1
+
+def _write_varint(out: bytearray, n: int):
+    while n >= 0x80:
+        out.append(n & 0x7F | 0x80)
+        n >>= 7
+    out.append(n)
+
+def _read_varint(data: bytes, i: int) -> tuple[int, int]:
+    """
+    Reads the varint that begins at data[i].
+    :return: The value and the index of the first byte after it.
+    """
+    n = shift = 0
+    while True:
+        b = data[i]
+        i += 1
+        n |= (b & 0x7F) << shift
+        shift += 7
+        if b < 0x80:
+            return n, i
+
+def _write_str(out: bytearray, s: str):
+    b = s.encode("utf-8")
+    _write_varint(out, len(b))
+    out += b
+
+def _read_str(data: bytes, i: int) -> tuple[str, int]:
+    n, i = _read_varint(data, i)
+    return data[i:i + n].decode("utf-8"), i + n
+
+
+class Recording:
+    """
+    The seed, the level and the keys pressed in every frame of a game.
+    Frames are stored as run-length encoded bitmasks, both in memory and on file.
+    """
+    def __init__(self, seed: int, config_path: str = ""):
+        self._seed = seed
+        self._config_path = config_path
+        self._keys: list[str] = [] # The i-th key is the i-th bit of the masks
+        self._bits: dict[str, int] = {}
+        self._runs: list[list[int]] = [] # [mask, count] pairs
+        self._frame_count = 0
+
+    def record(self, keys):
+        """
+        Adds a frame, in which the passed keys are pressed.
+        """
+        mask = 0
+        for k in keys:
+            if k not in self._bits:
+                self._bits[k] = 1 << len(self._keys)
+                self._keys.append(k)
+            mask |= self._bits[k]
+
+        if self._runs and self._runs[-1][0] == mask:
+            self._runs[-1][1] += 1
+        else:
+            self._runs.append([mask, 1])
+        self._frame_count += 1
+
+    def frames(self):
+        """
+        Generator of the keys pressed in each frame, in order.
+        """
+        for mask, count in self._runs:
+            keys = [k for i, k in enumerate(self._keys) if mask >> i & 1]
+            for _ in range(count):
+                yield keys
+
+    # -- GETTER METHODS --
+    def get_seed(self) -> int:
+        return self._seed
+
+    def get_config_path(self) -> str:
+        return self._config_path
+
+    def get_frame_count(self) -> int:
+        return self._frame_count
+
+    # -- FILE METHODS --
+    def save(self, path: str):
+        out = bytearray(MAGIC)
+        _write_varint(out, VERSION)
+        _write_varint(out, self._seed)
+        _write_str(out, self._config_path)
+        _write_varint(out, len(self._keys))
+        for k in self._keys:
+            _write_str(out, k)
+        for mask, count in self._runs:
+            _write_varint(out, mask)
+            _write_varint(out, count)
+
+        with open(path, "wb") as f:
+            f.write(out)
+
+    @classmethod
+    def load(cls, path: str) -> "Recording":
+        with open(path, "rb") as f:
+            data = f.read()
+
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError("File is not a recording")
+        version, i = _read_varint(data, len(MAGIC))
+        if version != VERSION:
+            raise ValueError(f"Recording version {version} is not supported")
+
+        seed, i = _read_varint(data, i)
+        config_path, i = _read_str(data, i)
+        recording = cls(seed, config_path)
+
+        key_count, i = _read_varint(data, i)
+        for b in range(key_count):
+            k, i = _read_str(data, i)
+            recording._keys.append(k)
+            recording._bits[k] = 1 << b
+
+        while i < len(data):
+            mask, i = _read_varint(data, i)
+            count, i = _read_varint(data, i)
+            recording._runs.append([mask, count])
+            recording._frame_count += count
+        return recording
+
+
+def replay(recording: Recording, config_path: str = None):
+    """
+    Fast-forward replay: the recorded game is rebuilt by ticking a GngGame with the recorded keys, as fast as possible.
+    Nothing is rendered, not even with g2d_headless.
+    :param config_path: Level config file. If None, the one saved in the recording is used.
+    :return: The GngGame, in the state it had at the end of the recording.
+    """
+    from src.framework.gnggame import GngGame # Lazy import to avoid circular import
+
+    game = GngGame(file_path=config_path or recording.get_config_path(), seed=recording.get_seed())
+    for keys in recording.frames():
+        game.tick(keys)
+    return game
+
+
+# TESTING
+import unittest
+import tempfile
+
+class RecordingTest(unittest.TestCase):
+    def test_save_and_load(self):
+        frames = [[], [], ["d"], ["d"], ["d", "Spacebar"], ["Spacebar"], []] + [["f"]] * 300
+
+        recording = Recording(2 ** 40 + 7, "configs/level1.txt")
+        for keys in frames:
+            recording.record(keys)
+
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "game.gngr")
+            recording.save(path)
+            loaded = Recording.load(path)
+            self.assertLess(os.path.getsize(path), 64)
+
+        self.assertEqual(recording.get_seed(), loaded.get_seed())
+        self.assertEqual("configs/level1.txt", loaded.get_config_path())
+        self.assertEqual(len(frames), loaded.get_frame_count())
+        self.assertEqual([sorted(k) for k in frames], [sorted(k) for k in loaded.frames()])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m src.framework.replay", description="Replays a recorded game.")
+    parser.add_argument("recording", help="path of the recording file")
+    parser.add_argument("--fast", action="store_true",
+                        help="only simulate the game (fast-forward) and print its final state, with no window")
+    args = parser.parse_args()
+
+    if args.fast:
+        os.environ.setdefault("GNG_HEADLESS", "1")
+        rec = Recording.load(args.recording)
+        start = time.perf_counter()
+        g = replay(rec)
+        elapsed = time.perf_counter() - start
+        print(f"Frames: {rec.get_frame_count()} ({rec.get_frame_count() / elapsed:.0f} per second)")
+        print(f"Lives: {g.get_lives()}/{g.get_max_lives()}, won: {g.game_won()}, game over: {g.game_over()}")
+    else:
+        from path_util import ROOT_PATH
+        from src.framework.gnggame import GngGui
+        GngGui(
+            bg_image=os.path.join(ROOT_PATH, "img/ghosts-goblins-bg.png"),
+            bg_crop_pos=(2, 10),
+            bg_size=(3584, 240),
+            zoom=3,
+            replay_path=args.recording
+        )